@@ -7,15 +7,20 @@
 
 from . import cache
 from . import cli
+from . import config
 from . import iterator
+from . import scheduler
 from . import splitter
-from .cache import CacheRegistry
+from .cache import BoundedCache, CacheRegistry
 from .cli import __version__, reduce
+from .config import ComplementConfig, IntervalConfig
 from .dd import DD
 from .iterator import CombinedIterator, IteratorRegistry
 from .limit_reduction import LimitReduction
 from .outcome import Outcome
-from .parallel_dd import ParallelDD
+from .parallel_dd import AsyncParallelDD, ParallelDD
 from .reduction_exception import ReductionError, ReductionException, ReductionStopped
+from .scheduler import AdaptiveConcurrency, PolicyRegistry
+from .server_test import ServerTest
 from .splitter import SplitterRegistry
-from .subprocess_test import ConcatTestBuilder, SubprocessTest
+from .subprocess_test import AsyncSubprocessTest, ConcatTestBuilder, SubprocessTest
@@ -0,0 +1,13 @@
+# Copyright (c) 2016-2023 Renata Hodovan, Akos Kiss.
+# Copyright (c) 2023 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from .outcome_cache import CacheRegistry, OutcomeCache
+from .config_cache import ConfigCache, ConfigTupleCache, NoCache
+from .bitset_cache import BitsetCache, MonotoneCache
+from .content_cache import ContentCache, ContentHashCache, ContentKeyedCache, PersistentCache
+from .bounded_cache import BoundedCache
@@ -0,0 +1,441 @@
+# Copyright (c) 2023 Renata Hodovan, Akos Kiss.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from bisect import bisect_right
+from sys import getsizeof
+
+from pympler.asizeof import asizeof as _asizeof
+
+from ..config import IntervalConfig
+from ..outcome import Outcome
+from .outcome_cache import _iter_runs, _LengthIndex, CacheRegistry, OutcomeCache
+
+
+@CacheRegistry.register('bitset')
+class BitsetCache(OutcomeCache):
+    """
+    This cache associates configurations with their test outcomes, using a
+    dictionary keyed by bitmasks (arbitrary-precision integers) over the atoms
+    of a base configuration. Since every configuration tested in a reduction
+    iteration is a subset of the configuration of the iteration, the cache uses
+    that as its base (as set by :meth:`rebase`). Hashing and comparing the keys
+    take O(N/64) machine words, and the keys are stored compactly. When the base
+    has shrunk to half of its width, the stored masks are re-based to the new
+    base and entries that are not subsets of it are dropped. Configurations
+    that are not subsets of the base are not cached. The cache trades time for
+    compactness: mapping configurations to masks is not free, so it is not
+    faster than :class:`ConfigTupleCache`, whose keys hash and compare their
+    runs natively.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False):
+        """
+        :param cache_fail: Add configurations with FAIL outcome to the cache.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations.
+        """
+        # NOTE: evict_after_fail=True should be safe as after a fail is found,
+        # reduction continues from there, generating only even smaller test
+        # cases, and larger tests are never re-tested again.
+        self._cache_fail = cache_fail
+        self._evict_after_fail = evict_after_fail
+        self.measure_memory = measure_memory
+        self._starts = None  # Start atoms of the runs of the base.
+        self._stops = None  # Stop atoms of the runs of the base.
+        self._offsets = None  # Bit positions of the start atoms of the runs of the base.
+        self._width = 0  # Number of atoms in the base.
+        self._outside = 0  # Mask of the atoms of the base that have been dropped since it was packed.
+        self._container = {}  # Masks to (result, length) pairs.
+        self._lengths = _LengthIndex()
+
+    def set_test_builder(self, test_builder):
+        self.clear()
+
+    def _mask(self, config, *, dropped=False):
+        """
+        Map a configuration to its bitmask over the base.
+
+        :param config: The configuration.
+        :param dropped: Map configurations containing atoms dropped from the
+            base since it was packed, too (see :meth:`_defer_rebase`).
+        :return: The bitmask, or None if there is no base or the configuration
+            is not a subset of it.
+        """
+        starts, stops, offsets = self._starts, self._stops, self._offsets
+        if starts is None:
+            return None
+
+        mask = 0
+        for start, stop in _iter_runs(config):
+            i = bisect_right(starts, start) - 1
+            if i < 0 or stop > stops[i]:
+                return None
+            mask |= ((1 << (stop - start)) - 1) << (offsets[i] + start - starts[i])
+        if mask & self._outside and not dropped:
+            return None
+        return mask
+
+    def _fields(self, config):
+        """
+        Determine how to re-base masks from the current base to a new one.
+
+        :param config: The new base configuration.
+        :return: Tuple: (mask of the new base over the current base, list of
+            the bit fields of the runs of the new base, i.e., their positions in
+            the current masks, their widths as masks, and their positions in the
+            new masks), or (None, None) if the new base is not a subset of the
+            current one.
+        """
+        keep = self._mask(config)
+        if keep is None:
+            return None, None
+
+        # The fields are the runs of set bits of the kept mask (not the runs
+        # of the new base, which may be many more): after a successful
+        # reduction step, there are only one or two of them.
+        fields = []
+        offset = 0
+        rest = keep
+        while rest:
+            low = rest & -rest
+            run = rest ^ (rest & (rest + low))
+            pos = low.bit_length() - 1
+            width = run.bit_length() - pos
+            fields.append((pos, (1 << width) - 1, offset))
+            offset += width
+            rest ^= run
+        return keep, fields
+
+    @staticmethod
+    def _pack(mask, fields):
+        """
+        Select the bits of the new base from a mask and pack them.
+        """
+        return sum(((mask >> old_pos) & field) << new_pos for old_pos, field, new_pos in fields)
+
+    def _defer_rebase(self, config):
+        """
+        Try to re-base to a configuration without re-packing the masks. Masks
+        over the current base stay valid for its subsets, so re-packing them is
+        deferred until the base shrinks to half of its width; until then, the
+        dropped atoms are only marked as outside of the base. Thus, the cost of
+        re-packing is amortized over the iterations, while the masks stay
+        compact.
+
+        :param config: The new base configuration.
+        :return: True if the current base has been kept.
+        """
+        if self._starts is None or 2 * len(config) <= self._width:
+            return False
+        keep = self._mask(config)
+        if keep is None:
+            return False
+        self._outside = ((1 << self._width) - 1) ^ keep
+        return True
+
+    def rebase(self, config):
+        config = IntervalConfig(config)
+        if self._defer_rebase(config):
+            return
+
+        container = self._container
+        keep, fields = self._fields(config) if container else (None, None)
+
+        runs = config.runs
+        self._starts = [start for start, _ in runs]
+        self._stops = [stop for _, stop in runs]
+        self._offsets = [0]
+        for start, stop in runs[:-1]:
+            self._offsets.append(self._offsets[-1] + stop - start)
+        self._width = len(config)
+        self._outside = 0
+
+        if container:
+            self._container = {}
+            self._lengths.clear()
+            self._reset_account()
+            if keep is not None:
+                for mask, (result, length) in container.items():
+                    if not mask & ~keep:
+                        self._store(self._pack(mask, fields), result, length)
+
+    def _store(self, mask, result, length):
+        if mask not in self._container:
+            self._lengths.add(mask, length)
+            if self.measure_memory:
+                self._account(self._entry_size(), 1)
+        self._container[mask] = (result, length)
+
+    def _entry_size(self):
+        return getsizeof((1 << self._width) - 1) + getsizeof((None, 0)) + 3 * 8
+
+    def add(self, config, result):
+        if result is Outcome.PASS or self._cache_fail:
+            mask = self._mask(config)
+            if mask is not None:
+                self._store(mask, result, len(config))
+
+    def lookup(self, config):
+        mask = self._mask(config)
+        if mask is None:
+            return None
+        result, _ = self._container.get(mask, (None, None))
+        return result
+
+    def clear(self):
+        self._container = {}
+        self._lengths.clear()
+        self._reset_account()
+
+    def clean(self, config):
+        if not self._evict_after_fail:
+            return
+
+        for mask in self._lengths.pop_longer(len(config)):
+            del self._container[mask]
+            if self.measure_memory:
+                self._account(-self._entry_size(), -1)
+
+    def evict(self, config):
+        mask = self._mask(config, dropped=True)
+        if mask is None:
+            return
+        entry = self._container.pop(mask, None)
+        if entry is not None:
+            self._lengths.discard(mask, entry[1])
+            if self.measure_memory:
+                self._account(-self._entry_size(), -1)
+
+    def entry_size(self, config):
+        return self._entry_size()
+
+    def __str__(self):
+        return '{\n%s}' % ''.join(f'\t{mask:#x}: {r.name!r},\n' for mask, (r, _) in sorted(self._container.items()))
+
+    def measure_size(self):
+        return _asizeof(self._container)
+
+
+@CacheRegistry.register('monotone')
+class MonotoneCache(BitsetCache):
+    """
+    Cache for monotone tests, i.e., for tests where all subsets of a passing
+    configuration pass as well (and all supersets of a failing configuration
+    fail as well). Beyond the exact matches stored like in
+    :class:`BitsetCache`, the cache keeps the maximal known passing
+    configurations (and, if FAIL outcomes are cached, the minimal known failing
+    configurations) and answers lookups of any of their subsets (supersets).
+    When re-basing, passing configurations are projected to the new base, as
+    their intersection with it is known to pass, too.
+
+    The cache must only be used with monotone tests, otherwise reduction may
+    skip interesting configurations.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False):
+        """
+        :param cache_fail: Add configurations with FAIL outcome to the cache.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations.
+        """
+        super().__init__(cache_fail=cache_fail, evict_after_fail=evict_after_fail, measure_memory=measure_memory)
+        self._passes = _Antichain(maximal=True)  # Maximal passing masks.
+        self._fails = _Antichain(maximal=False)  # Minimal failing masks.
+
+    def add(self, config, result):
+        if result is Outcome.PASS or self._cache_fail:
+            mask = self._mask(config)
+            if mask is None:
+                return
+            self._store(mask, result, len(config))
+            if result is Outcome.PASS:
+                self._passes.add(mask, len(config))
+            else:
+                self._fails.add(mask, len(config))
+
+    def lookup(self, config):
+        mask = self._mask(config)
+        if mask is None:
+            return None
+        result, _ = self._container.get(mask, (None, None))
+        if result is not None:
+            return result
+
+        length = len(config)
+        if self._passes.covers(mask, length):
+            return Outcome.PASS
+        if self._fails.covers(mask, length):
+            return Outcome.FAIL
+        return None
+
+    def clear(self):
+        super().clear()
+        self._passes.reset(self._width)
+        self._fails.reset(self._width)
+
+    def clean(self, config):
+        super().clean(config)
+        if not self._evict_after_fail:
+            return
+
+        # Passing configurations stay informative (see rebase) but failing
+        # configurations longer than the current one cannot be subsets of any
+        # configuration tested from now on.
+        self._fails.discard_longer(len(config))
+
+    def evict(self, config):
+        super().evict(config)
+        mask = self._mask(config, dropped=True)
+        if mask is not None:
+            self._passes.discard(mask)
+            self._fails.discard(mask)
+
+    def rebase(self, config):
+        config = IntervalConfig(config)
+        if self._defer_rebase(config):
+            return
+
+        passes, fails = list(self._passes.items()), list(self._fails.items())
+        keep, fields = self._fields(config) if passes or fails else (None, None)
+        super().rebase(config)
+
+        self._passes.reset(self._width)
+        self._fails.reset(self._width)
+        if keep is None:
+            return
+
+        projected = []
+        for mask, length in passes:
+            if mask & keep != mask:
+                mask &= keep
+                length = bin(mask).count('1')
+            projected.append((length, mask))
+        # Adding the longest projections first, no mask can be dominated by a
+        # later one.
+        projected.sort(reverse=True)
+        for length, mask in projected:
+            self._passes.add(self._pack(mask, fields), length, prune=False)
+        for mask, length in fails:
+            if mask & keep == mask:
+                self._fails.add(self._pack(mask, fields), length, prune=False)
+
+    def measure_size(self):
+        return _asizeof((self._container, self._passes, self._fails))
+
+
+class _Antichain(object):
+    """
+    Antichain of maximal (or minimal) masks, indexed for subset (or superset)
+    queries.
+
+    Every mask is represented by a key: for maximal masks, the key is the set
+    of atoms missing from the mask, and for minimal masks, it is the mask
+    itself. Then, a query mask is dominated by a mask of the antichain iff the
+    key of the latter is a subset of the key of the query. The keys are
+    bucketed by their lowest set bit, so a query has to check only the buckets
+    of the set bits of its key (e.g., a handful of bits, when querying a
+    complement against maximal masks), or, if its key is dense, the buckets
+    whose bit is set in it. The masks are also indexed by their lengths, so
+    updates only visit the masks whose lengths allow them to be dominated by
+    the new mask (or to be longer than a limit).
+    """
+
+    def __init__(self, *, maximal):
+        self._maximal = maximal
+        self._full = 0  # Mask of the base.
+        self._entries = {}  # Masks to their keys and lengths.
+        self._buckets = {}  # Lowest set bits to the sets of keys (-1 for the empty key).
+        self._lengths = _LengthIndex()  # Masks by their lengths.
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def items(self):
+        return ((mask, length) for mask, (_, length) in self._entries.items())
+
+    def _key(self, mask):
+        return self._full ^ mask if self._maximal else mask
+
+    def _dominated_key(self, key, key_length):
+        buckets = self._buckets
+        if not buckets:
+            return False
+        if -1 in buckets:
+            return True
+        # NOTE: Walking the set bits of the key costs a big int operation per
+        # bit, so it is only done if there are fewer of them than buckets.
+        if key_length < len(buckets):
+            rest = key
+            while rest:
+                low = rest & -rest
+                bucket = buckets.get(low.bit_length() - 1)
+                if bucket is not None and any(k & key == k for k in bucket):
+                    return True
+                rest ^= low
+            return False
+        return any(key >> bit & 1 and any(k & key == k for k in bucket) for bit, bucket in buckets.items())
+
+    def covers(self, mask, length):
+        """
+        Check whether a mask is dominated by a mask of the antichain (i.e., is
+        a subset of a maximal mask, or a superset of a minimal mask).
+
+        :param mask: The mask to check.
+        :param length: The number of set bits of the mask.
+        """
+        key = self._key(mask)
+        return self._dominated_key(key, self._full.bit_length() - length if self._maximal else length)
+
+    def add(self, mask, length, prune=True):
+        """
+        Add a mask to the antichain unless it is dominated by one of its masks,
+        and remove the masks dominated by the new one.
+
+        :param mask: The mask to add.
+        :param length: The number of set bits of the mask.
+        :param prune: Remove the masks dominated by the new one (may be skipped
+            if the caller knows that there are none).
+        """
+        if mask in self._entries or self.covers(mask, length):
+            return
+        key = self._key(mask)
+        if prune:
+            # Only subsets of a maximal mask (or supersets of a minimal mask),
+            # i.e., masks not longer (or not shorter) than it, are dominated.
+            candidates = self._lengths.between(0, length) if self._maximal else self._lengths.between(length, self._full.bit_length())
+            for m in [m for m in candidates if key & self._entries[m][0] == key]:
+                self.discard(m)
+        self._entries[mask] = (key, length)
+        self._buckets.setdefault((key & -key).bit_length() - 1, set()).add(key)
+        self._lengths.add(mask, length)
+
+    def discard(self, mask):
+        entry = self._entries.get(mask)
+        if entry is not None:
+            self._lengths.discard(mask, entry[1])
+            self._remove(mask)
+
+    def discard_longer(self, length):
+        for mask in self._lengths.pop_longer(length):
+            self._remove(mask)
+
+    def _remove(self, mask):
+        key, _ = self._entries.pop(mask)
+        low = (key & -key).bit_length() - 1
+        bucket = self._buckets[low]
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[low]
+
+    def reset(self, width):
+        """
+        Remove all masks, and set the width of the base.
+        """
+        self._full = (1 << width) - 1
+        self._entries.clear()
+        self._buckets.clear()
+        self._lengths.clear()
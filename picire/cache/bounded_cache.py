@@ -0,0 +1,155 @@
+# Copyright (c) 2023 Renata Hodovan, Akos Kiss.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
+from itertools import count
+
+from ..config import IntervalConfig
+from .outcome_cache import _LengthIndex, OutcomeCache
+
+
+class BoundedCache(OutcomeCache):
+    """
+    Wrapper around a cache that keeps the estimated memory consumption of the
+    stored entries under a limit. When the limit is exceeded, entries are
+    evicted according to a policy: 'lru' evicts the least recently used
+    entries, 'largest' evicts the largest entries, and 'oldest' evicts the
+    entries in the order they were added (i.e., entries of the oldest
+    iterations first).
+    """
+
+    policies = ('lru', 'largest', 'oldest')
+
+    def __init__(self, *, cache_class, memory_limit, policy='lru', **cache_config):
+        """
+        :param cache_class: Reference to the cache class to wrap.
+        :param memory_limit: Limit of the estimated memory consumption of the
+            cache entries (in bytes).
+        :param policy: Eviction policy ('lru', 'largest', or 'oldest').
+        :param cache_config: Keyword arguments to initialize cache_class with.
+        """
+        if policy not in self.policies:
+            raise ValueError(f'Unknown eviction policy: {policy}')
+
+        self._cache = cache_class(**cache_config)
+        self._memory_limit = memory_limit
+        self._policy = policy
+        self._evict_after_fail = cache_config.get('evict_after_fail', True)
+        self._entries = OrderedDict()  # Tracked configurations and their estimated sizes.
+        self._lengths = _LengthIndex()  # Tracked configurations by their lengths.
+        self._heap = []  # Heap of tracked configurations by size (only for the 'largest' policy).
+        self._counter = count()
+        self._size = 0
+        self._evictions = 0
+
+    def set_test_builder(self, test_builder):
+        # NOTE: Entries that would survive the change of the test builder
+        # (e.g., in content-keyed caches) could not be evicted by their
+        # configurations anymore, thus they would exceed the memory limit
+        # unnoticed. Therefore, the tracked entries are evicted while their
+        # configurations are still meaningful.
+        for key in self._entries:
+            self._cache.evict(key)
+        self._cache.set_test_builder(test_builder)
+        self._forget()
+
+    def add(self, config, result):
+        self._cache.add(config, result)
+        if self._cache.lookup(config) is not None:
+            self._track(config)
+
+    def lookup(self, config):
+        result = self._cache.lookup(config)
+        if result is not None:
+            self._track(config)
+        return result
+
+    def clear(self):
+        self._cache.clear()
+        self._forget()
+
+    def clean(self, config):
+        self._cache.clean(config)
+        if not self._evict_after_fail:
+            return
+
+        for c in self._lengths.pop_longer(len(config)):
+            self._size -= self._entries.pop(c)
+
+    def rebase(self, config):
+        self._cache.rebase(config)
+        if type(self._cache).rebase is OutcomeCache.rebase:
+            return
+
+        # Stop tracking the entries that the cache dropped while re-basing.
+        evicted = [c for c in self._entries if self._cache.lookup(c) is None]
+        for c in evicted:
+            self._lengths.discard(c, len(c))
+            self._size -= self._entries.pop(c)
+
+    def evict(self, config):
+        self._cache.evict(config)
+        key = self._key(config)
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._lengths.discard(key, len(key))
+            self._size -= size
+
+    def entry_size(self, config):
+        return self._cache.entry_size(config)
+
+    def get_evictions(self):
+        return self._evictions
+
+    def get_size(self):
+        return self._cache.get_size()
+
+    def __str__(self):
+        return self._cache.__str__()
+
+    @staticmethod
+    def _key(config):
+        # NOTE: Views (e.g., complements) must not be kept alive by the index.
+        return config if type(config) is IntervalConfig else IntervalConfig(config)  # pylint: disable=unidiomatic-typecheck
+
+    def _forget(self):
+        self._entries.clear()
+        self._lengths.clear()
+        self._heap.clear()
+        self._size = 0
+
+    def _track(self, config):
+        key = self._key(config)
+        if key in self._entries:
+            if self._policy == 'lru':
+                self._entries.move_to_end(key)
+            return
+
+        size = self._cache.entry_size(key)
+        self._entries[key] = size
+        self._lengths.add(key, len(key))
+        self._size += size
+        if self._policy == 'largest':
+            heappush(self._heap, (-size, next(self._counter), key))
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [item for item in self._heap if item[2] in self._entries]
+                heapify(self._heap)
+
+        while self._size > self._memory_limit and self._entries:
+            if self._policy == 'largest':
+                _, _, key = heappop(self._heap)
+                if key not in self._entries:
+                    continue
+                size = self._entries.pop(key)
+            else:
+                key, size = self._entries.popitem(last=False)
+            self._lengths.discard(key, len(key))
+
+            self._cache.evict(key)
+            self._size -= size
+            self._evictions += 1
@@ -0,0 +1,286 @@
+# Copyright (c) 2016-2023 Renata Hodovan, Akos Kiss.
+# Copyright (c) 2023 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from sys import getsizeof
+
+from pympler.asizeof import asizeof as _asizeof, flatsize as _flatsize
+
+from ..config import IntervalConfig
+from ..outcome import Outcome
+from .outcome_cache import _config_size, _iter_runs, _LengthIndex, CacheRegistry, OutcomeCache
+
+
+@CacheRegistry.register('none')
+class NoCache(OutcomeCache):
+    """
+    Implementation of a disabled cache. Does not store anything, so no cache hit
+    can occur, ever.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False):
+        """
+        :param cache_fail: Unused, only added for compatibility with other cache
+            implementations.
+        :param evict_after_fail: Unused, only added for compatibility with other
+            cache implementations.
+        """
+
+    def set_test_builder(self, test_builder):
+        pass
+
+    def add(self, config, result):
+        pass
+
+    def lookup(self, config):
+        return None
+
+    def clear(self):
+        pass
+
+    def clean(self, config):
+        pass
+
+    def evict(self, config):
+        pass
+
+    def entry_size(self, config):
+        return 0
+
+    def __str__(self):
+        return '{}'
+
+
+@CacheRegistry.register('config')
+class ConfigCache(OutcomeCache):
+    """
+    Re-implementation of Zeller's original caching approach. The cache
+    associates configurations (i.e., lists of elements) with their test
+    outcomes, using a tree as the underlying data structure. The edges of the
+    tree are the contiguous runs of the configurations.
+    """
+
+    class _Entry(object):
+        """
+        This class holds test outcomes for configurations. This avoids running
+        the same test twice.
+
+        The outcome cache is implemented as a tree.  Each node points to the
+        outcome of the remaining list of runs. Leaf nodes have no tail
+        dictionary allocated at all.
+
+        Example: ([1, 2, 3], PASS), ([1, 2, 3, 5], FAIL), ([1, 2, 4], FAIL):
+
+              ((1, 4), PASS)--((5, 6), FAIL)
+             /
+        (None)
+             \
+              ((1, 3), None)--((4, 5), FAIL)
+        """
+
+        __slots__ = ('result', 'tail')
+
+        def __init__(self):
+            self.result = None  # Result so far
+            self.tail = None  # Points to outcome of tail (if any)
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False):
+        """
+        :param cache_fail: Add configurations with FAIL outcome to the cache.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations.
+        """
+        # NOTE: evict_after_fail=True should be safe as after a fail is found,
+        # reduction continues from there, generating only even smaller test
+        # cases, and larger tests are never re-tested again.
+        self._cache_fail = cache_fail
+        self._evict_after_fail = evict_after_fail
+        self.measure_memory = measure_memory
+        self._node_size = _flatsize(self._Entry()) + getsizeof(()) + 3 * 8
+        self._root = self._Entry()
+        self._reset_account()
+
+    def set_test_builder(self, test_builder):
+        self.clear()
+
+    def add(self, config, result):
+        if result is Outcome.PASS or self._cache_fail:
+            p = self._root
+            for run in _iter_runs(config):
+                if p.tail is None:
+                    p.tail = {}
+                e = p.tail.get(run)
+                if e is None:
+                    e = p.tail[run] = self._Entry()
+                    self._account(self._node_size, 1)
+                p = e
+            p.result = result
+
+    def lookup(self, config):
+        p = self._root
+        for run in _iter_runs(config):
+            p = p.tail.get(run) if p.tail else None
+            if p is None:
+                return None
+        return p.result
+
+    def clear(self):
+        self._root = self._Entry()
+        self._reset_account()
+
+    def clean(self, config):
+        if not self._evict_after_fail:
+            return
+
+        stack = [(self._root, len(config))]
+        while stack:
+            p, length = stack.pop()
+            if not p.tail:
+                continue
+            for run, e in list(p.tail.items()):
+                run_length = run[1] - run[0]
+                if run_length > length:
+                    del p.tail[run]
+                    if self.measure_memory:
+                        nodes = self._count_nodes(e)
+                        self._account(-nodes * self._node_size, -nodes)
+                else:
+                    stack.append((e, length - run_length))
+            if not p.tail:
+                p.tail = None
+
+    def evict(self, config):
+        path = []
+        p = self._root
+        for run in _iter_runs(config):
+            e = p.tail.get(run) if p.tail else None
+            if e is None:
+                return
+            path.append((p, run))
+            p = e
+        p.result = None
+
+        # Prune the nodes that became useless, bottom-up.
+        for parent, run in reversed(path):
+            if p.result is not None or p.tail:
+                break
+            del parent.tail[run]
+            self._account(-self._node_size, -1)
+            if not parent.tail:
+                parent.tail = None
+            p = parent
+
+    @staticmethod
+    def _count_nodes(entry):
+        count = 0
+        stack = [entry]
+        while stack:
+            p = stack.pop()
+            count += 1
+            if p.tail:
+                stack.extend(p.tail.values())
+        return count
+
+    def _reset_account(self):
+        # The root node is always allocated.
+        self._size = self._node_size
+        self._count = 1
+
+    def entry_size(self, config):
+        return self._node_size * sum(1 for _ in _iter_runs(config))
+
+    def __str__(self):
+        s = ['{\n']
+        stack = [((), self._root)]
+        while stack:
+            runs, p = stack.pop()
+            if p.result is not None:
+                s.append(f'\t{list(runs)!r}: {p.result.name!r},\n')
+            if p.tail:
+                stack.extend((runs + (run,), e) for run, e in sorted(p.tail.items(), reverse=True))
+        s.append('}')
+        return ''.join(s)
+
+    def measure_size(self):
+        tsize = 0
+        stack = [self._root]
+        while stack:
+            p = stack.pop()
+            tsize += _flatsize(p)
+            if p.tail:
+                tsize += _flatsize(p.tail)
+                stack.extend(p.tail.values())
+        return tsize
+
+
+@CacheRegistry.register('config-tuple')
+class ConfigTupleCache(OutcomeCache):
+    """
+    This cache associates configurations (i.e., lists of elements) with their
+    test outcomes, using a dictionary keyed by the tuples of their contiguous
+    runs as the underlying data structure.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False):
+        """
+        :param cache_fail: Add configurations with FAIL outcome to the cache.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations.
+        """
+        # NOTE: evict_after_fail=True should be safe as after a fail is found,
+        # reduction continues from there, generating only even smaller test
+        # cases, and larger tests are never re-tested again.
+        self._cache_fail = cache_fail
+        self._evict_after_fail = evict_after_fail
+        self.measure_memory = measure_memory
+        self._container = {}
+        self._lengths = _LengthIndex()
+
+    def set_test_builder(self, test_builder):
+        self.clear()
+
+    def add(self, config, result):
+        if result is Outcome.PASS or self._cache_fail:
+            config = IntervalConfig(config)
+            if config not in self._container:
+                self._lengths.add(config, len(config))
+                if self.measure_memory:
+                    self._account(self.entry_size(config), 1)
+            self._container[config] = result
+
+    def lookup(self, config):
+        return self._container.get(config if isinstance(config, IntervalConfig) else IntervalConfig(config), None)
+
+    def clear(self):
+        self._container = {}
+        self._lengths.clear()
+        self._reset_account()
+
+    def clean(self, config):
+        if not self._evict_after_fail:
+            return
+
+        for c in self._lengths.pop_longer(len(config)):
+            del self._container[c]
+            if self.measure_memory:
+                self._account(-self.entry_size(c), -1)
+
+    def evict(self, config):
+        config = config if isinstance(config, IntervalConfig) else IntervalConfig(config)
+        if self._container.pop(config, None) is not None:
+            self._lengths.discard(config, len(config))
+            if self.measure_memory:
+                self._account(-self.entry_size(config), -1)
+
+    def entry_size(self, config):
+        return _config_size(config) + 3 * 8
+
+    def __str__(self):
+        return '{\n%s}' % ''.join(f'\t{list(c.runs)!r}: {r.name!r},\n' for c, r in sorted(self._container.items(), key=lambda item: item[0].runs))
+
+    def measure_size(self):
+        return _asizeof(self._container)
@@ -0,0 +1,346 @@
+# Copyright (c) 2016-2023 Renata Hodovan, Akos Kiss.
+# Copyright (c) 2023 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+import os
+import sqlite3
+
+from hashlib import sha3_256
+from sys import getsizeof
+from threading import Lock
+
+from pympler.asizeof import asizeof as _asizeof
+
+from ..outcome import Outcome
+from .config_cache import ConfigTupleCache
+from .outcome_cache import _LengthIndex, CacheRegistry, OutcomeCache
+
+
+class ContentKeyedCache(OutcomeCache):
+    """
+    Abstract base class of caches that associate test contents (built from
+    configurations) with their test outcomes. Lookups are two-tiered: outcomes
+    are looked up by configuration in a config-keyed tier first, and the test
+    content is built for the content-keyed tier only on a miss. Thus, repeated
+    lookups of the same configuration do not pay for building test contents.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False):
+        """
+        :param cache_fail: Add configurations with FAIL outcome to the cache.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations.
+        """
+        # NOTE: evict_after_fail=True should be safe as after a fail is found,
+        # reduction continues from there, generating only even smaller test
+        # cases, and larger tests are never re-tested again.
+        self._cache_fail = cache_fail
+        self._evict_after_fail = evict_after_fail
+        self.measure_memory = measure_memory
+        self._config_tier = ConfigTupleCache(cache_fail=cache_fail, evict_after_fail=evict_after_fail, measure_memory=measure_memory)
+        self._container = {}
+        self._lengths = _LengthIndex()
+        self._test_builder = None
+
+    def set_test_builder(self, test_builder):
+        # Only the config-keyed tier is invalidated, test contents and their
+        # outcomes are independent of the atoms.
+        self._config_tier.clear()
+        self._test_builder = test_builder
+
+    def add(self, config, result):
+        if result is Outcome.PASS or self._cache_fail:
+            self._config_tier.add(config, result)
+            self._add_content(config, result)
+
+    def lookup(self, config):
+        result = self._config_tier.lookup(config)
+        if result is None:
+            result = self._lookup_content(config)
+            if result is not None:
+                self._config_tier.add(config, result)
+        return result
+
+    def clear(self):
+        self._config_tier.clear()
+        self._container = {}
+        self._lengths.clear()
+        self._reset_account()
+
+    def clean(self, config):
+        if not self._evict_after_fail:
+            return
+
+        self._config_tier.clean(config)
+        self._clean_content(self._content_length(config))
+
+    def evict(self, config):
+        self._config_tier.evict(config)
+        self._evict_content(config)
+
+    def entry_size(self, config):
+        return self._config_tier.entry_size(config) + self._content_entry_size(config)
+
+    def get_size(self):
+        if not self.measure_memory:
+            return 0, 0
+
+        # The running totals of the cache itself only account for the
+        # content-keyed tier.
+        config_size, _ = self._config_tier.get_size()
+        content_size, content_count = super().get_size()
+        return config_size + content_size, content_count
+
+    def measure_size(self):
+        return _asizeof(self._container)
+
+    def _content_length(self, config):
+        """
+        Determine the length of the test content of a configuration, without
+        building the content if the test builder can tell it directly.
+
+        :param config: The configuration.
+        :return: The length of the test content.
+        """
+        content_length = getattr(self._test_builder, 'content_length', None)
+        if content_length is not None:
+            return content_length(config)
+        return len(self._test_builder(config))
+
+    def _add_content(self, config, result):
+        """
+        Add the test content of a configuration to the content-keyed tier.
+
+        :param config: The configuration whose test content to save.
+        :param result: The outcome of the added test content.
+        """
+        raise NotImplementedError()
+
+    def _lookup_content(self, config):
+        """
+        Look up the outcome of the test content of a configuration in the
+        content-keyed tier.
+
+        :param config: The configuration whose test content we are looking for.
+        :return: PASS or FAIL if the content is in the cache; None, otherwise.
+        """
+        raise NotImplementedError()
+
+    def _clean_content(self, length):
+        """
+        Delete test contents from the content-keyed tier that are longer than
+        the given length.
+
+        :param length: The length of the current test content.
+        """
+        raise NotImplementedError()
+
+    def _evict_content(self, config):
+        """
+        Remove the test content of a configuration from the content-keyed tier.
+
+        :param config: The configuration whose test content to remove.
+        """
+        raise NotImplementedError()
+
+    def _content_entry_size(self, config):
+        """
+        Estimate the memory needed to store the test content of a configuration
+        in the content-keyed tier.
+
+        :param config: The configuration.
+        :return: The estimated size in bytes.
+        """
+        raise NotImplementedError()
+
+
+@CacheRegistry.register('content')
+class ContentCache(ContentKeyedCache):
+    """
+    A cache implementation that associates test contents (built from
+    configurations) with their test outcomes.
+    """
+
+    def _add_content(self, config, result):
+        test_content = self._test_builder(config)
+        if test_content not in self._container:
+            self._lengths.add(test_content, len(test_content))
+            if self.measure_memory:
+                self._account(self._content_size(test_content), 1)
+        self._container[test_content] = result
+
+    def _lookup_content(self, config):
+        return self._container.get(self._test_builder(config), None)
+
+    def _evict_content(self, config):
+        test_content = self._test_builder(config)
+        if self._container.pop(test_content, None) is not None:
+            self._lengths.discard(test_content, len(test_content))
+            if self.measure_memory:
+                self._account(-self._content_size(test_content), -1)
+
+    def _content_entry_size(self, config):
+        return getsizeof('') + self._content_length(config) + 3 * 8
+
+    @staticmethod
+    def _content_size(test_content):
+        return getsizeof(test_content) + 3 * 8
+
+    def _clean_content(self, length):
+        for c in self._lengths.pop_longer(length):
+            del self._container[c]
+            if self.measure_memory:
+                self._account(-self._content_size(c), -1)
+
+    def __str__(self):
+        return '{\n%s}' % ''.join(f'\t{c!r}: {r.name!r},\n' for c, r in sorted(self._container.items()))
+
+
+@CacheRegistry.register('content-hash')
+class ContentHashCache(ContentKeyedCache):
+    """
+    A cache implementation that associates hashed test contents with their
+    test outcomes. If the test builder can hash the test contents of
+    configurations incrementally (like :class:`ConcatTestBuilder`), the test
+    contents are not even built. Otherwise, the contents are built and hashed
+    with the given hash constructor.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False, hash_ctor=sha3_256):
+        """
+        :param cache_fail: Unused, only added for compatibility with other cache
+            implementations.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations.
+        :param hash_ctor: A hash object constructor from hashlib (used only if
+            the test builder cannot hash test contents).
+        """
+        # NOTE: Caching by hashed content is only safe if FAIL outcomes are not
+        # stored in the cache. Therefore, the value of the cache_fail argument
+        # is not taken into account but is forced to False.
+        super().__init__(cache_fail=False, evict_after_fail=evict_after_fail, measure_memory=measure_memory)
+        self._hash_ctor = hash_ctor
+
+    def _hash_content(self, config):
+        content_hash = getattr(self._test_builder, 'content_hash', None)
+        if content_hash is not None:
+            return content_hash(config)
+
+        test_content = self._test_builder(config)
+        return self._hash_ctor(test_content.encode('utf-8')).digest(), len(test_content)
+
+    def _add_content(self, config, result):
+        content_hash, length = self._hash_content(config)
+        if content_hash not in self._container:
+            self._lengths.add(content_hash, length)
+            if self.measure_memory:
+                self._account(self._content_entry_size(config), 1)
+        self._container[content_hash] = (result, length)
+
+    def _lookup_content(self, config):
+        content_hash, _ = self._hash_content(config)
+        result, _ = self._container.get(content_hash, (None, None))
+        return result
+
+    def _evict_content(self, config):
+        content_hash, length = self._hash_content(config)
+        if self._container.pop(content_hash, None) is not None:
+            self._lengths.discard(content_hash, length)
+            if self.measure_memory:
+                self._account(-self._content_entry_size(config), -1)
+
+    def _content_entry_size(self, config):
+        return getsizeof(bytes(32)) + getsizeof((None, 0)) + getsizeof(1 << 10) + 3 * 8
+
+    def _clean_content(self, length):
+        evicted = self._lengths.pop_longer(length)
+        for h in evicted:
+            del self._container[h]
+        if self.measure_memory:
+            self._account(-len(evicted) * self._content_entry_size(None), -len(evicted))
+
+    def __str__(self):
+        return '{\n%s}' % ''.join(f'\t{h.hex()}/{l}: {r.name!r},\n' for h, (r, l) in sorted(self._container.items()))
+
+
+@CacheRegistry.register('persistent')
+class PersistentCache(ContentKeyedCache):
+    """
+    A cache implementation that associates hashed test contents with their test
+    outcomes in an SQLite database on disk. The outcomes survive the reduction
+    session and are shared by all processes (parallel or subsequent reductions)
+    using the same database. Entries are namespaced, e.g., by a fingerprint of
+    the tester, so that outcomes of different testers are not mixed up.
+    Clearing the cache clears its in-memory part only.
+    """
+
+    def __init__(self, *, cache_fail=False, evict_after_fail=True, measure_memory=False, path=None, namespace='', hash_ctor=sha3_256, timeout=60.0):
+        """
+        :param cache_fail: Unused, only added for compatibility with other cache
+            implementations.
+        :param evict_after_fail: When a configuration with a FAIL outcome is
+            added to the cache, evict all larger configurations from the
+            in-memory config-keyed tier. (Entries on disk are never evicted.)
+        :param path: Path to the database file (default:
+            ~/.cache/picire/cache.sqlite).
+        :param namespace: Namespace of the entries, e.g., a fingerprint of the
+            tester.
+        :param hash_ctor: A hash object constructor from hashlib.
+        :param timeout: Seconds to wait for a database lock held by another
+            process.
+        """
+        # NOTE: Caching by hashed content is only safe if FAIL outcomes are not
+        # stored in the cache. Therefore, the value of the cache_fail argument
+        # is not taken into account but is forced to False.
+        super().__init__(cache_fail=False, evict_after_fail=evict_after_fail, measure_memory=measure_memory)
+        self._path = path or os.path.join(os.path.expanduser('~'), '.cache', 'picire', 'cache.sqlite')
+        self._namespace = namespace
+        self._hash_ctor = hash_ctor
+        self._lock = Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+        self._db = sqlite3.connect(self._path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS outcomes (namespace TEXT NOT NULL, hash BLOB NOT NULL, outcome TEXT NOT NULL, length INTEGER NOT NULL, PRIMARY KEY (namespace, hash)) WITHOUT ROWID')
+
+    def _hash_content(self, test_content):
+        return self._hash_ctor(test_content.encode('utf-8')).digest()
+
+    def _add_content(self, config, result):
+        test_content = self._test_builder(config)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?)',
+                             (self._namespace, self._hash_content(test_content), result.value, len(test_content)))
+
+    def _lookup_content(self, config):
+        test_content = self._test_builder(config)
+        with self._lock:
+            row = self._db.execute('SELECT outcome FROM outcomes WHERE namespace = ? AND hash = ?',
+                                   (self._namespace, self._hash_content(test_content))).fetchone()
+        return Outcome(row[0]) if row else None
+
+    def _clean_content(self, length):
+        pass
+
+    def _evict_content(self, config):
+        pass
+
+    def _content_entry_size(self, config):
+        return 0
+
+    def get_size(self):
+        if not self.measure_memory:
+            return 0, 0
+
+        # Only the in-memory part of the cache is measured.
+        return self._config_tier.get_size()
+
+    def __str__(self):
+        with self._lock:
+            rows = self._db.execute('SELECT hash, length, outcome FROM outcomes WHERE namespace = ? ORDER BY hash', (self._namespace,)).fetchall()
+        return '{\n%s}' % ''.join(f'\t{h.hex()}/{l}: {r!r},\n' for h, l, r in rows)
@@ -0,0 +1,242 @@
+# Copyright (c) 2016-2023 Renata Hodovan, Akos Kiss.
+# Copyright (c) 2023 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from bisect import bisect_left, bisect_right, insort
+from sys import getsizeof
+
+from pympler.asizeof import asizeof as _asizeof
+
+from ..config import IntervalConfig
+
+
+def _iter_runs(config):
+    return config.iter_runs() if isinstance(config, IntervalConfig) else iter(IntervalConfig(config).runs)
+
+
+# Approximate memory footprint of an IntervalConfig and of each of its runs
+# (the run tuple, its start and stop ints, and the related slots and ints of
+# the runs and ends tuples).
+_CONFIG_SIZE = getsizeof(IntervalConfig()) + 2 * getsizeof(())
+_RUN_SIZE = getsizeof((0, 0)) + 3 * getsizeof(1 << 10) + 2 * 8
+
+
+def _config_size(config):
+    return _CONFIG_SIZE + _RUN_SIZE * sum(1 for _ in _iter_runs(config))
+
+
+class _LengthIndex(object):
+    """
+    Index of cache keys bucketed by their lengths. The distinct lengths are
+    kept sorted, so that the keys longer than a given length can be removed in
+    time proportional to the number of removed keys (and buckets), without
+    scanning all the keys.
+    """
+
+    def __init__(self):
+        self._buckets = {}  # Length to the set of keys of that length.
+        self._lengths = []  # Sorted list of the lengths with non-empty buckets.
+
+    def add(self, key, length):
+        bucket = self._buckets.get(length)
+        if bucket is None:
+            bucket = self._buckets[length] = set()
+            insort(self._lengths, length)
+        bucket.add(key)
+
+    def discard(self, key, length):
+        bucket = self._buckets.get(length)
+        if bucket is None:
+            return
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[length]
+            self._lengths.remove(length)
+
+    def between(self, low, high):
+        """
+        Iterate over the keys whose lengths are in a range.
+
+        :param low: The lower bound of the lengths (inclusive).
+        :param high: The upper bound of the lengths (inclusive).
+        :return: Iterator of the keys (the index must not be changed while
+            iterating).
+        """
+        lengths = self._lengths
+        for length in lengths[bisect_left(lengths, low):bisect_right(lengths, high)]:
+            yield from self._buckets[length]
+
+    def pop_longer(self, length):
+        """
+        Remove the keys longer than the given length from the index.
+
+        :param length: The length limit.
+        :return: List of the removed keys.
+        """
+        evicted = []
+        while self._lengths and self._lengths[-1] > length:
+            evicted.extend(self._buckets.pop(self._lengths.pop()))
+        return evicted
+
+    def clear(self):
+        self._buckets.clear()
+        self._lengths.clear()
+
+
+class CacheRegistry(object):
+    registry = {}
+
+    @classmethod
+    def register(cls, cache_name):
+        def decorator(cache_class):
+            cls.registry[cache_name] = cache_class
+            return cache_class
+        return decorator
+
+
+class OutcomeCache(object):
+    """
+    Abstract base class for configuration outcome caching strategies.
+
+    Caches that measure their memory consumption maintain a running estimate of
+    their size and entry count, updated incrementally whenever entries are
+    added or removed. The estimate is re-calibrated by actually measuring the
+    memory consumption (which is costly) every ``calibration_interval`` size
+    queries.
+    """
+
+    #: The number of :meth:`get_size` calls after which the running size
+    #: estimate is re-calibrated by :meth:`measure_size` (0 to disable).
+    calibration_interval = 1000
+
+    measure_memory = False
+    _size = 0  # Running estimate of the size of the stored data.
+    _count = 0  # Running count of the stored entries.
+    _size_queries = 0
+
+    def set_test_builder(self, test_builder):
+        """
+        Set the test builder for the cache. Configurations are only meaningful
+        with the test builder (i.e., the atoms) they were added with, so
+        config-keyed entries are dropped, while entries keyed by test contents
+        stay valid (e.g., when switching from lines to characters).
+
+        :param test_builder: Callable object that creates test case from a
+            configuration. It must be identical to the test builder used by the
+            tester class.
+        """
+        raise NotImplementedError()
+
+    def add(self, config, result):
+        """
+        Add a new configuration to the cache.
+
+        :param config: The configuration to save.
+        :param result: The outcome of the added configuration.
+        """
+        raise NotImplementedError()
+
+    def lookup(self, config):
+        """
+        Cache lookup to find out the outcome of a given configuration.
+
+        :param config: The configuration we are looking for.
+        :return: PASS or FAIL if config is in the cache; None, otherwise.
+        """
+        raise NotImplementedError()
+
+    def clear(self):
+        """
+        Clear the cache.
+        """
+        raise NotImplementedError()
+
+    def clean(self, config):
+        """
+        Delete cache entries that are larger than the current one.
+
+        :param config: The configuration from wich larger entries are deleted.
+        """
+        raise NotImplementedError()
+
+    def rebase(self, config):
+        """
+        Notify the cache that all configurations added or looked up from now on
+        are subsets of the given configuration (i.e., of the configuration of
+        the current reduction iteration). Caches that do not exploit this
+        information ignore it.
+
+        :param config: The configuration of the current reduction iteration.
+        """
+
+    def evict(self, config):
+        """
+        Remove a configuration from the cache (if it is stored at all).
+
+        :param config: The configuration to remove.
+        """
+        raise NotImplementedError()
+
+    def entry_size(self, config):
+        """
+        Estimate the memory needed to store a configuration in the cache.
+
+        :param config: The configuration to estimate the entry size of.
+        :return: The estimated size in bytes.
+        """
+        return _config_size(config)
+
+    def get_evictions(self):
+        """
+        Returns the number of entries evicted because of memory limits.
+        """
+        return 0
+
+    def get_size(self):
+        """
+        Returns the total size of the stored cache data and the cache entry count.
+        """
+        if not self.measure_memory:
+            return 0, 0
+
+        self._size_queries += 1
+        if self.calibration_interval and self._size_queries % self.calibration_interval == 0:
+            self.calibrate()
+        return self._size, self._count
+
+    def measure_size(self):
+        """
+        Measure the actual size of the stored cache data (potentially by
+        walking all the stored objects).
+
+        :return: The size in bytes.
+        """
+        raise NotImplementedError()
+
+    def calibrate(self):
+        """
+        Replace the running estimate of the size of the stored cache data with
+        its actual, measured size.
+        """
+        self._size = self.measure_size()
+
+    def _account(self, size, count):
+        """
+        Update the running totals of the cache.
+
+        :param size: Change of the size of the stored data (bytes).
+        :param count: Change of the number of stored entries.
+        """
+        self._size += size
+        self._count += count
+
+    def _reset_account(self):
+        """
+        Reset the running totals of the cache.
+        """
+        self._size = 0
+        self._count = 0
@@ -14,6 +14,7 @@ import sys
 import time
 
 from datetime import timedelta
+from hashlib import sha256
 from math import inf
 from multiprocessing import cpu_count
 from os.path import basename, exists, join, realpath
@@ -29,14 +30,18 @@ import inators
 
 from inators import log as logging
 
-from .cache import CacheRegistry
+from .cache import BoundedCache, CacheRegistry
+from .config import IntervalConfig
 from .dd import DD
 from .iterator import CombinedIterator, IteratorRegistry
 from .limit_reduction import LimitReduction
+from .outcome import Outcome
 from .parallel_dd import ParallelDD
 from .reduction_exception import ReductionException, ReductionStopped
+from .scheduler import AdaptiveConcurrency, PolicyRegistry
+from .server_test import ServerTest
 from .splitter import SplitterRegistry
-from .subprocess_test import ConcatTestBuilder, SubprocessTest
+from .subprocess_test import AsyncSubprocessTest, ConcatTestBuilder, SubprocessTest
 
 from .events.event_listener import EventListener
 from .events.stats import Statistics
@@ -55,6 +60,15 @@ def create_parser():
             raise argparse.ArgumentTypeError(f'invalid value: {value!r} (must be at least 2)')
         return value
 
+    def memory_size(value):
+        units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+        try:
+            if value[-1:].upper() in units:
+                return int(value[:-1]) * units[value[-1:].upper()]
+            return int(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f'invalid value: {value!r} (must be an integer, optionally followed by K, M, or G)') from e
+
     parser = argparse.ArgumentParser(description='Command line interface of the "picire" test case reducer')
     parser.add_argument('-i', '--input', metavar='FILE', required=True,
                         help='test case to be reduced')
@@ -68,6 +82,8 @@ def create_parser():
                         help='split algorithm (%(choices)s; default: %(default)s)')
     parser.add_argument('--test', metavar='FILE', required=True,
                         help='test command that decides about interestingness of an input')
+    parser.add_argument('--test-server', action='store_true', default=False,
+                        help='keep the test command running as a server that reads length-prefixed test cases from its stdin and writes length-prefixed FAIL or PASS responses to its stdout')
     parser.add_argument('--granularity', metavar='N', type=int_or_inf, default=2,
                         help='initial granularity and split factor (integer or \'inf\'; default: %(default)d)')
     parser.add_argument('--encoding', metavar='NAME',
@@ -82,6 +98,18 @@ def create_parser():
                         help='run DD in parallel')
     parser.add_argument('-j', '--jobs', metavar='N', type=int, default=cpu_count(),
                         help='maximum number of test commands to execute in parallel (has effect in parallel mode only; default: %(default)s)')
+    parser.add_argument('--parallel-executor', metavar='NAME', choices=ParallelDD.executors, default='thread',
+                        help='pool to execute the test commands in (%(choices)s; has effect in parallel mode only; default: %(default)s)')
+    parser.add_argument('--parallel-policy', metavar='NAME', choices=sorted(PolicyRegistry.registry.keys()), default='order',
+                        help='policy to prioritize the test commands waiting for execution (%(choices)s; has effect in parallel mode only; default: %(default)s)')
+    parser.add_argument('--adaptive-jobs', action='store_true', default=False,
+                        help='adapt the number of test commands executed in parallel to the CPU and memory load, with --jobs being the maximum (has effect in parallel mode only)')
+    parser.add_argument('--jobs-memory-reserve', metavar='SIZE', type=memory_size,
+                        help='amount of memory to keep available when adapting the number of parallel test commands (in bytes, optionally followed by K, M, or G; has effect with --adaptive-jobs only; default: 10%% of the physical memory)')
+    parser.add_argument('--speculate', action='store_true', default=False,
+                        help='use idle workers to test the configurations of the next cycle in advance (has effect in parallel mode only)')
+    parser.add_argument('--deterministic', action='store_true', default=False,
+                        help='evaluate test outcomes in the order of the sequential algorithm to get the same result (has effect in parallel mode only)')
 
     # Tweaks how to walk through the chunk lists.
     parser.add_argument('--complement-first', dest='subset_first', action='store_false', default=True,
@@ -100,12 +128,27 @@ def create_parser():
                         help='disable the eviction of larger test cases from the cache when a failing, i.e., interesting test case is found')
     parser.add_argument('--measure-memory', action='store_true', default=False,
                         help='measure the memory consumption of the cache memory')
+    parser.add_argument('--cache-memory-limit', metavar='SIZE', type=memory_size,
+                        help='limit the estimated memory consumption of the cache (in bytes, optionally followed by K, M, or G; default: no limit)')
+    parser.add_argument('--cache-eviction', metavar='NAME',
+                        choices=BoundedCache.policies, default='lru',
+                        help='eviction policy of the cache if its memory is limited (%(choices)s; default: %(default)s)')
+    parser.add_argument('--cache-path', metavar='FILE',
+                        help='database file of the persistent cache (has effect with --cache=persistent only; default: ~/.cache/picire/cache.sqlite)')
 
     # Limits on the reduction.
     parser.add_argument('--limit-time', metavar='SEC', type=int,
                         help='limit the execution time of reduction (in seconds; may result in non-minimal output)')
     parser.add_argument('--limit-tests', metavar='N', type=int,
                         help='limit the number of test command executions (may result in non-minimal output)')
+    parser.add_argument('--timeout', metavar='SEC', type=float,
+                        help='limit the wall-clock time of a test command execution (the process group of the command is killed if it is exceeded)')
+    parser.add_argument('--timeout-outcome', metavar='NAME', choices=['pass', 'fail', 'timeout'], default='timeout',
+                        help='how to interpret a test that exceeded its time limit (%(choices)s; timeout: like pass, but the result is not cached; default: %(default)s)')
+    parser.add_argument('--cpu-limit', metavar='SEC', type=int,
+                        help='limit the CPU time of a test command execution (RLIMIT_CPU; POSIX only)')
+    parser.add_argument('--memory-limit', metavar='SIZE', type=memory_size,
+                        help='limit the address space of a test command execution (RLIMIT_AS; POSIX only; integer, optionally followed by K, M, or G)')
 
     # Logging settings.
     inators.arg.add_log_level_argument(parser)
@@ -119,6 +162,12 @@ def create_parser():
                         help='working directory (default: input.timestamp)')
     parser.add_argument('--no-cleanup', dest='cleanup', default=True, action='store_false',
                         help='disable the removal of generated temporary files')
+    parser.add_argument('--delivery', metavar='NAME', choices=SubprocessTest.deliveries, default='file',
+                        help='how to pass the test cases to the test command (%(choices)s; with stdin and memfd, no files are written unless --no-cleanup is given; default: %(default)s)')
+    parser.add_argument('--reuse-test-dirs', dest='reuse_dirs', action='store_true', default=False,
+                        help='run the test commands in reused scratch directories and clean up (or keep) their files in the background')
+    parser.add_argument('--scratch-dir', metavar='DIR',
+                        help='directory to create the reused scratch directories in (e.g., /dev/shm; has effect with --reuse-test-dirs only; default: the tests directory of the working directory)')
     parser.add_argument('--statistics', metavar='STATFILE', default=None,
                         help='gather statistics during reduction and export in JSON format')
     return parser
@@ -129,6 +178,29 @@ def config_logging(args):
     inators.arg.process_log_level_argument(args, logger)
 
 
+def tester_fingerprint(command, encoding, mode='subprocess'):
+    """
+    Compute a fingerprint of a tester command, which changes whenever the
+    command, the way it is run, or the contents of any of the files it refers
+    to change.
+
+    :param command: The tester command (or command pattern) as a sequence of
+        arguments.
+    :param encoding: The encoding of the test cases.
+    :param mode: How the tester command is run: 'subprocess' (once per test)
+        or 'server' (see :class:`ServerTest`). The two protocols differ, thus
+        so do the fingerprints.
+    :return: Hexadecimal digest of the fingerprint.
+    """
+    fingerprint = sha256(mode.encode('utf-8') + b'\0' + encoding.encode('utf-8'))
+    for arg in command:
+        fingerprint.update(b'\0' + arg.encode('utf-8'))
+        if os.path.isfile(arg):
+            with open(arg, 'rb') as f:
+                fingerprint.update(b'\0' + f.read())
+    return fingerprint.hexdigest()
+
+
 def process_args(args):
     args.input = realpath(args.input)
     if not exists(args.input):
@@ -153,17 +225,43 @@ def process_args(args):
     if not exists(args.test) or not os.access(args.test, os.X_OK):
         raise ValueError(f'Tester program does not exist or isn\'t executable: {args.test}')
 
-    args.tester_class = SubprocessTest
-    args.tester_config = {'command_pattern': [args.test, '%s'],
-                          'work_dir': join(args.out, 'tests'),
-                          'filename': basename(args.input),
-                          'encoding': args.encoding,
-                          'cleanup': args.cleanup}
+    if args.test_server:
+        if args.parallel and args.parallel_executor == 'async':
+            raise ValueError('The test server cannot be used with the async executor')
+        if args.cpu_limit is not None or args.memory_limit is not None:
+            raise ValueError('Resource limits cannot be used with the test server')
+        args.tester_class = ServerTest
+        args.tester_config = {'command': [args.test],
+                              'work_dir': join(args.out, 'tests'),
+                              'encoding': args.encoding,
+                              'timeout': args.timeout}
+    else:
+        args.tester_class = AsyncSubprocessTest if args.parallel and args.parallel_executor == 'async' else SubprocessTest
+        args.tester_config = {'command_pattern': [args.test, '%s'],
+                              'work_dir': join(args.out, 'tests'),
+                              'filename': basename(args.input),
+                              'encoding': args.encoding,
+                              'cleanup': args.cleanup,
+                              'reuse_dirs': args.reuse_dirs,
+                              'scratch_dir': args.scratch_dir,
+                              'delivery': args.delivery,
+                              'timeout': args.timeout,
+                              'cpu_limit': args.cpu_limit,
+                              'memory_limit': args.memory_limit}
 
     args.cache_class = CacheRegistry.registry[args.cache]
     args.cache_config = {'cache_fail': args.cache_fail,
                          'evict_after_fail': args.evict_after_fail,
                          'measure_memory': args.measure_memory}
+    if args.cache == 'persistent':
+        args.cache_config.update(path=realpath(args.cache_path) if args.cache_path else None,
+                                 namespace=tester_fingerprint(args.tester_config['command'] if args.test_server else args.tester_config['command_pattern'],
+                                                              args.encoding, mode='server' if args.test_server else 'subprocess'))
+    if args.cache_memory_limit is not None:
+        args.cache_config.update(cache_class=args.cache_class,
+                                 memory_limit=args.cache_memory_limit,
+                                 policy=args.cache_eviction)
+        args.cache_class = BoundedCache
 
     if args.limit_time or args.limit_tests:
         stop = LimitReduction(deadline=timedelta(seconds=args.limit_time) if args.limit_time else None,
@@ -177,13 +275,19 @@ def process_args(args):
                                                               IteratorRegistry.registry[args.complement_iterator]),
                           'split': SplitterRegistry.registry[args.split](n=args.granularity),
                           'dd_star': args.dd_star,
-                          'stop': stop}
+                          'stop': stop,
+                          'timeout_outcome': Outcome[args.timeout_outcome.upper()]}
     if not args.parallel:
         args.reduce_class = DD
     else:
         args.reduce_class = ParallelDD
         args.reduce_config.update(proc_num=args.jobs)
         args.reduce_config.update(greeddy=args.greeddy)
+        args.reduce_config.update(executor=args.parallel_executor)
+        args.reduce_config.update(policy=PolicyRegistry.registry[args.parallel_policy]())
+        args.reduce_config.update(concurrency=AdaptiveConcurrency(args.jobs, memory_reserve=args.jobs_memory_reserve) if args.adaptive_jobs else None)
+        args.reduce_config.update(speculate=args.speculate)
+        args.reduce_config.update(deterministic=args.deterministic)
 
     logger.info('Input loaded from %s', args.input)
 
@@ -270,16 +374,18 @@ def reduce(src, *,
 
         test_builder = ConcatTestBuilder(src)
         if cache:
-            cache.clear()
+            # NOTE: Content-keyed caches keep their entries across atom phases,
+            # config-keyed caches drop them.
             cache.set_test_builder(test_builder)
 
-        dd = reduce_class(tester_class(test_builder=test_builder, **tester_config),
+        tester = tester_class(test_builder=test_builder, **tester_config)
+        dd = reduce_class(tester,
                           cache=cache,
                           id_prefix=(f'a{atom_cnt}',),
                           observer=observer,
                           **reduce_config)
         try:
-            min_set = dd(list(range(len(src))))
+            min_set = dd(IntervalConfig(range(len(src))))
             src = test_builder(min_set)
 
             logger.trace('The cached results are: %s', cache)
@@ -291,12 +397,16 @@ def reduce(src, *,
 
             e.result = test_builder(e.result)
             raise
+        finally:
+            close = getattr(tester, 'close', None)
+            if close is not None:
+                close()
 
     return src
 
 
 def postprocess(args, out_src, statistics):
-    if args.cleanup:
+    if args.cleanup and exists(join(args.out, 'tests')):
         rmtree(join(args.out, 'tests'))
 
     output = join(args.out, basename(args.input))
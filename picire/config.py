@@ -0,0 +1,288 @@
+# Copyright (c) 2023 Renata Hodovan, Akos Kiss.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from bisect import bisect_right
+from collections.abc import Sequence
+from itertools import accumulate, chain, islice
+from operator import eq
+
+
+class IntervalConfig(Sequence):
+    """
+    Immutable configuration (i.e., sequence of atom indices) represented as a
+    sequence of contiguous runs. Memory consumption, splitting, concatenation,
+    hashing and comparison scale with the number of runs instead of the number
+    of atoms, while the class still behaves like a sequence of integers.
+    """
+
+    __slots__ = ('_runs', '_ends', '_hash')
+
+    def __init__(self, config=()):
+        """
+        :param config: Iterable of atom indices, or another IntervalConfig.
+        """
+        if isinstance(config, IntervalConfig):
+            runs = config.runs
+        elif isinstance(config, range) and config.step == 1:
+            runs = ((config.start, config.stop),) if config else ()
+        else:
+            runs = []
+            for c in config:
+                if runs and runs[-1][1] == c:
+                    runs[-1][1] = c + 1
+                else:
+                    runs.append([c, c + 1])
+            runs = tuple((start, stop) for start, stop in runs)
+        self._init(runs)
+
+    def _init(self, runs):
+        self._runs = runs
+        self._ends = tuple(accumulate(stop - start for start, stop in runs))
+        self._hash = None
+
+    @classmethod
+    def from_runs(cls, runs):
+        """
+        Create a configuration from (start, stop) pairs of half-open index
+        ranges. Empty runs are dropped and adjacent runs are merged.
+
+        :param runs: Iterable of (start, stop) pairs.
+        :return: The new configuration.
+        """
+        merged = []
+        for start, stop in runs:
+            if start >= stop:
+                continue
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], stop)
+            else:
+                merged.append((start, stop))
+        config = cls.__new__(cls)
+        config._init(tuple(merged))
+        return config
+
+    @classmethod
+    def concat(cls, configs):
+        """
+        Concatenate configurations (e.g., the subsets of a split).
+
+        :param configs: Iterable of configurations.
+        :return: The concatenated configuration.
+        """
+        return cls.from_runs(chain.from_iterable(c.iter_runs() if isinstance(c, IntervalConfig) else cls(c).runs for c in configs))
+
+    @property
+    def runs(self):
+        """
+        The (start, stop) pairs of the maximal contiguous runs of the
+        configuration.
+        """
+        return self._runs
+
+    def iter_runs(self):
+        """
+        Iterate over the maximal contiguous runs of the configuration.
+
+        :return: Iterator of (start, stop) pairs.
+        """
+        return iter(self._runs)
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __iter__(self):
+        return chain.from_iterable(range(start, stop) for start, stop in self._runs)
+
+    def __getitem__(self, key):
+        length = len(self)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(length)
+            if step != 1:
+                return IntervalConfig(list(self)[key])
+            if start >= stop:
+                return IntervalConfig()
+
+            i = bisect_right(self._ends, start)
+            runs = []
+            while i < len(self._runs):
+                run_start, run_stop = self._runs[i]
+                begin = self._ends[i] - (run_stop - run_start)
+                if begin >= stop:
+                    break
+                runs.append((run_start + max(start - begin, 0), run_start + min(stop - begin, run_stop - run_start)))
+                i += 1
+            return IntervalConfig.from_runs(runs)
+
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError('config index out of range')
+        i = bisect_right(self._ends, key)
+        run_start, run_stop = self._runs[i]
+        return run_start + key - (self._ends[i] - (run_stop - run_start))
+
+    def __contains__(self, value):
+        return any(start <= value < stop for start, stop in self._runs)
+
+    def __add__(self, other):
+        return IntervalConfig.concat((self, other))
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            # Configurations compare equal to lists of the same atom indices
+            # (e.g., to results of reductions checked against expected lists).
+            return len(self) == len(other) and all(map(eq, self, other))
+        if not isinstance(other, IntervalConfig):
+            return NotImplemented
+        return self.runs == other.runs
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self._runs)
+        return self._hash
+
+    def __reduce__(self):
+        return IntervalConfig.from_runs, (self._runs,)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}.from_runs({list(self._runs)!r})'
+
+
+class ComplementConfig(IntervalConfig):
+    """
+    Lazy view of the configuration that remains after removing one subset from
+    a split configuration. Its length is known in advance and it can be
+    iterated without building anything. Its runs are only materialized if a
+    consumer (e.g., a cache hashing it) needs them, and then they are cut from
+    the runs of the whole split configuration (the prefix before and the suffix
+    after the removed subset, merged at the seam), which takes time
+    proportional to the number of runs of the complement, not to the number of
+    subsets.
+    """
+
+    __slots__ = ('_subsets', '_index', '_length', '_split_index')
+
+    def __init__(self, subsets, index, length=None, *, split_index=None):
+        """
+        :param subsets: List of configurations that the current configuration
+            is split to. The list must not be modified while the view is in use.
+        :param index: Index of the subset to leave out.
+        :param length: The length of the complement, if known by the caller
+            (e.g., from the prefix sums of the subset lengths).
+        :param split_index: The index of the runs of the split configuration,
+            shared by all the complement views of the same split (created on
+            demand if not given).
+        """
+        # pylint: disable=super-init-not-called
+        self._subsets = subsets
+        self._index = index
+        self._split_index = split_index
+        if length is None:
+            length = self._get_split_index().complement_length(index)
+        self._length = length
+        self._runs = None
+        self._ends = None
+        self._hash = None
+
+    def _get_split_index(self):
+        if self._split_index is None:
+            self._split_index = _SplitIndex(self._subsets)
+        return self._split_index
+
+    @property
+    def subsets(self):
+        """
+        The subsets of the split configuration (including the left out one).
+        """
+        return self._subsets
+
+    @property
+    def removed(self):
+        """
+        The index of the left out subset.
+        """
+        return self._index
+
+    def parts(self):
+        """
+        Iterate over the subsets that make up the complement.
+
+        :return: Iterator of configurations.
+        """
+        return chain(islice(self._subsets, self._index), islice(self._subsets, self._index + 1, None))
+
+    def _materialize(self):
+        if self._runs is None:
+            self._init(self._get_split_index().complement_runs(self._index))
+
+    @property
+    def runs(self):
+        self._materialize()
+        return self._runs
+
+    def iter_runs(self):
+        return iter(self.runs)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        if self._runs is not None:
+            return super().__iter__()
+        return chain.from_iterable(self.parts())
+
+    def __getitem__(self, key):
+        self._materialize()
+        return super().__getitem__(key)
+
+    def __contains__(self, value):
+        self._materialize()
+        return super().__contains__(value)
+
+    def __hash__(self):
+        self._materialize()
+        return super().__hash__()
+
+    def __reduce__(self):
+        return IntervalConfig.from_runs, (self.runs,)
+
+    def __repr__(self):
+        return f'{IntervalConfig.__name__}.from_runs({list(self.runs)!r})'
+
+
+class _SplitIndex(object):
+    """
+    Index of a split configuration shared by its complement views: the runs
+    of the whole configuration and the offsets of the subsets in it, from
+    which the prefix before and the suffix after any subset can be sliced.
+    """
+
+    def __init__(self, subsets):
+        self._subsets = subsets
+        self._offsets = None
+        self._whole = None
+
+    @property
+    def offsets(self):
+        if self._offsets is None:
+            self._offsets = (0,) + tuple(accumulate(len(s) for s in self._subsets))
+        return self._offsets
+
+    def complement_length(self, index):
+        offsets = self.offsets
+        return offsets[-1] - (offsets[index + 1] - offsets[index])
+
+    def complement_runs(self, index):
+        # NOTE: Concurrent views may build the whole configuration twice, but
+        # the results are equal.
+        if self._whole is None:
+            self._whole = IntervalConfig.concat(self._subsets)
+        whole, offsets = self._whole, self.offsets
+        prefix, suffix = whole[:offsets[index]].runs, whole[offsets[index + 1]:].runs
+        if prefix and suffix and prefix[-1][1] == suffix[0][0]:
+            return prefix[:-1] + ((prefix[-1][0], suffix[0][1]),) + suffix[1:]
+        return prefix + suffix
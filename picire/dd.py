@@ -10,6 +10,7 @@ import itertools
 import logging
 
 from .cache import ConfigCache
+from .config import ComplementConfig, IntervalConfig, _SplitIndex
 from .iterator import CombinedIterator
 from .outcome import Outcome
 from .splitter import ZellerSplit
@@ -25,7 +26,8 @@ class DD(object):
     """
 
     def __init__(self, test, *, split=None, cache=None, id_prefix=None,
-                 config_iterator=None, dd_star=False, stop=None, observer=None):
+                 config_iterator=None, dd_star=False, stop=None, timeout_outcome=Outcome.TIMEOUT,
+                 observer=None):
         """
         Initialize a DD object.
 
@@ -37,6 +39,9 @@ class DD(object):
             config indices in an arbitrary order.
         :param dd_star: Boolean to enable the DD star algorithm.
         :param stop: A callable invoked before the execution of every test.
+        :param timeout_outcome: How to treat the tests that exceeded their time
+            limit (i.e., whose tester returned TIMEOUT): as PASS, as FAIL, or
+            as TIMEOUT, which is not interesting but is not cached either.
         """
         self._test = test
         self._split = split or ZellerSplit()
@@ -46,19 +51,26 @@ class DD(object):
         self._config_iterator = config_iterator or CombinedIterator()
         self._dd_star = dd_star
         self._stop = stop
+        self._timeout_outcome = timeout_outcome
         self._observer = observer or EventListener()
 
     def __call__(self, config):
         """
         Return a 1-minimal failing subset of the initial configuration.
 
-        :param config: The initial configuration that will be reduced.
-        :return: 1-minimal failing configuration.
+        :param config: The initial configuration that will be reduced (a
+            sequence of atom indices, preferably an :class:`IntervalConfig`).
+        :return: 1-minimal failing configuration (as an
+            :class:`IntervalConfig`, which compares equal to the list of the
+            same atom indices).
         :raises ReductionException: If reduction could not run until completion.
             The ``result`` attribute of the exception contains the smallest,
             potentially non-minimal, but failing configuration found during
             reduction.
         """
+        config = IntervalConfig(config)
+        self._cache.rebase(config)
+
         for iter_cnt in itertools.count():
             self._observer.notify('iteration_started', { 'iteration': iter_cnt, 'configuration': config})
 
@@ -69,7 +81,7 @@ class DD(object):
 
             for run in itertools.count():
                 self._observer.notify('cycle_started', { 'iteration': iter_cnt, 'cycle': run, 'configuration': subsets})
-                assert self._test_config(self._cache._test_builder(config), (f'r{run}', 'assert')) is Outcome.FAIL
+                assert self._test_config(config, (f'r{run}', 'assert')) is Outcome.FAIL
 
                 # Minimization ends if the configuration is already reduced to a single unit.
                 if len(config) < 2:
@@ -98,8 +110,9 @@ class DD(object):
                     changed = True
                     # Interesting configuration is found, continue reduction with this configuration.
                     subsets = next_subsets
-                    config = [c for s in subsets for c in s]
+                    config = IntervalConfig.concat(subsets)
                     self._cache.clean(config)
+                    self._cache.rebase(config)
 
                     self._observer.notify('successful_reduction', { 'configuration': config})
 
@@ -133,6 +146,8 @@ class DD(object):
             next complement_offset).
         """
         n = len(subsets)
+        length = sum(len(s) for s in subsets)
+        split_index = _SplitIndex(subsets)
         fvalue = n
         for i in self._config_iterator(n):
             if i >= 0:
@@ -141,21 +156,34 @@ class DD(object):
             else:
                 i = (-i - 1 + complement_offset) % n
                 config_id = (f'r{run}', f'c{i}')
-                config_set = [c for si, s in enumerate(subsets) for c in s if si != i]
+                config_set = ComplementConfig(subsets, i, length - len(subsets[i]), split_index=split_index)
                 i = -i - 1
 
             # Get the outcome either from cache or by testing it.
-            # TODO (23114): Temporary tweaks: save the config -> content transformation and do it in an outer
-            # level! Needs some adjustments later.
-            content = self._cache._test_builder(config_set)
-            outcome = self._lookup_cache(content, config_id)
+            outcome = self._lookup_cache(config_set, config_id)
             if outcome is None:
                 self._check_stop()
-                outcome = self._test_config(content, config_id)
+                outcome = self._test_config(config_set, config_id)
             if outcome is Outcome.FAIL:
                 fvalue = i
                 break
 
+        return self._next_subsets(subsets, fvalue, complement_offset)
+
+    @staticmethod
+    def _next_subsets(subsets, fvalue, complement_offset):
+        """
+        Determine the outcome of the reduce task of ddmin from the index of the
+        first interesting configuration.
+
+        :param subsets: List of sets that the current configuration is split to.
+        :param fvalue: The index of the interesting subset (non-negative), or
+            the negative index of the interesting complement (-1 for the first
+            complement), or the number of subsets if none was interesting.
+        :param complement_offset: The current complement offset.
+        :return: Tuple: (list of subsets composing the failing config or None,
+            next complement_offset).
+        """
         # fvalue contains the index of the cycle in the previous loop
         # which was found interesting. Otherwise it's n.
         if fvalue < 0:
@@ -163,7 +191,7 @@ class DD(object):
             # In next run, start removing the following subset
             fvalue = -fvalue - 1
             return subsets[:fvalue] + subsets[fvalue + 1:], fvalue
-        if fvalue < n:
+        if fvalue < len(subsets):
             # Interesting subset is found.
             return [subsets[fvalue]], 0
 
@@ -205,18 +233,44 @@ class DD(object):
         :param config: The current configuration to test.
         :param config_id: Unique ID that will be used to save tests to easily
             identifiable directories.
-        :return: PASS or FAIL
+        :return: PASS or FAIL (or TIMEOUT, see timeout_outcome)
         """
         config_id = self._iteration_prefix + config_id
 
-        self._observer.notify('test_started', { 'configuration': config, 'configuration_id': self._pretty_config_id(config_id)})
+        self._test_started(config, config_id)
         outcome = self._test(config, config_id)
+        return self._test_finished(config, config_id, outcome)
+
+    def _test_started(self, config, config_id):
+        """
+        Notify the observer about the start of a test.
+
+        :param config: The configuration under test.
+        :param config_id: The full ID of the configuration.
+        """
+        self._observer.notify('test_started', { 'configuration': config, 'configuration_id': self._pretty_config_id(config_id)})
+
+    def _test_finished(self, config, config_id, outcome):
+        """
+        Notify the observer about the outcome of a test and save the outcome in
+        cache.
+
+        :param config: The tested configuration.
+        :param config_id: The full ID of the configuration.
+        :param outcome: The outcome of the test (as returned by the tester).
+        :return: The outcome of the test as treated by the reducer (see
+            timeout_outcome).
+        """
         self._observer.notify('test_finished', {
             'configuration': config,
             'configuration_id': self._pretty_config_id(config_id),
             'outcome' : outcome})
 
-        if 'assert' not in config_id:
+        outcome = self._effective_outcome(outcome)
+        # NOTE: The outcome of cancelled tests is unknown, they cannot be
+        # cached. Neither can be timeouts, as they may depend on the load of
+        # the system.
+        if 'assert' not in config_id and outcome not in (Outcome.UNKNOWN, Outcome.TIMEOUT):
             self._cache.add(config, outcome)
             size, length = self._cache.get_size()
             self._observer.notify('cache_insert', {
@@ -224,11 +278,22 @@ class DD(object):
                 'configuration_id': self._pretty_config_id(config_id),
                 'outcome' : outcome,
                 'size': size,
-                'length': length
+                'length': length,
+                'evictions': self._cache.get_evictions()
             })
 
         return outcome
 
+    def _effective_outcome(self, outcome):
+        """
+        Map the outcome returned by the tester to the outcome treated by the
+        reducer (i.e., apply timeout_outcome).
+
+        :param outcome: The outcome returned by the tester.
+        :return: The outcome treated by the reducer.
+        """
+        return self._timeout_outcome if outcome is Outcome.TIMEOUT else outcome
+
     @staticmethod
     def _pretty_config_id(config_id):
         """
@@ -74,7 +74,9 @@ class EventHandler(ABC):
         The configuration testing has been finished.
         :param configuration: Configuration to be tested.
         :param configuration_id: Unique identifier of the configuration.
-        :param outcome: Outcome of the testing function (FAIL or PASS).
+        :param outcome: Outcome of the testing function (FAIL or PASS, or
+            UNKNOWN if the test has been cancelled, or TIMEOUT if it has
+            exceeded its time limit).
         """
         pass
 
@@ -94,7 +96,8 @@ class EventHandler(ABC):
                      configuration_id : str,
                      outcome : Outcome,
                      size: int,
-                     length: int) -> None:
+                     length: int,
+                     evictions: int) -> None:
         """
         A cache lookup has been performed and its result.
         :param configuration: Configuration to be searched.
@@ -102,5 +105,29 @@ class EventHandler(ABC):
         :param outcome: Outcome of the cache (FAIL or PASS, or None if cache miss).
         :param size: Size of the cache (bytes).
         :param length: Number of entries in cache.
+        :param evictions: Number of entries evicted from the cache so far
+            because of its memory limit.
+        """
+        pass
+
+    @abstractmethod
+    def concurrency_changed(self,
+                            jobs : int,
+                            previous : int,
+                            reason : str,
+                            cpu_percent : float,
+                            available_memory : int,
+                            test_memory : int) -> None:
+        """
+        The number of tests running in parallel has been adapted to the load
+        of the system.
+        :param jobs: New number of tests allowed to run in parallel.
+        :param previous: Previous number of tests allowed to run in parallel.
+        :param reason: Reason of the change ('memory' if the available memory
+            is low, 'cpu' if the CPU is saturated, or 'idle' if resources are
+            left unused).
+        :param cpu_percent: Observed CPU utilization (percent).
+        :param available_memory: Observed available memory (bytes).
+        :param test_memory: Estimated memory consumption of a test (bytes).
         """
         pass
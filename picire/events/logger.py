@@ -48,5 +48,16 @@ class Logger(EventHandler):
                      outcome: Outcome,
                      size: int,
                      length: int,
+                     evictions: int,
                      **kwargs) -> None:
-        self.logger.debug(f'\t [{configuration_id}]: cache => {outcome.name} (cache: {length} items, {size} bytes)')
+        self.logger.debug(f'\t [{configuration_id}]: cache => {outcome.name} (cache: {length} items, {size} bytes, {evictions} evictions)')
+
+    def concurrency_changed(self,
+                            jobs: int,
+                            previous: int,
+                            reason: str,
+                            cpu_percent: float,
+                            available_memory: int,
+                            test_memory: int,
+                            **kwargs) -> None:
+        self.logger.info(f'\t Parallel tests: {previous} -> {jobs} ({reason}; cpu: {cpu_percent}%, available memory: {available_memory} bytes, test memory: {test_memory} bytes)')
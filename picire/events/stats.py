@@ -44,10 +44,17 @@ class Statistics(EventHandler):
         self.tests_started = counterclass(0)
         self.tests_passed = counterclass(0)
         self.tests_failed = counterclass(0)
+        self.tests_cancelled = counterclass(0)
+        self.tests_timed_out = counterclass(0)
 
         self.cache_hits = counterclass(0)
         self.cache_items = counterclass(0)
         self.cache_size = counterclass(0)
+        self.cache_evictions = counterclass(0)
+
+        self.concurrency_changes = counterclass(0)
+        self.jobs_min = None
+        self.jobs_max = None
 
         self.runtime = None
         self._start_time = time()
@@ -84,19 +91,30 @@ class Statistics(EventHandler):
     def test_finished(self, outcome: Outcome, **kwargs) -> None:
         if outcome is Outcome.FAIL:
             self.tests_failed += 1
+        elif outcome is Outcome.UNKNOWN:
+            self.tests_cancelled += 1
+        elif outcome is Outcome.TIMEOUT:
+            self.tests_timed_out += 1
         else:
             self.tests_passed += 1
 
     def cache_lookup(self, **kwargs) -> None:
         self.cache_hits += 1
 
-    def cache_insert(self, size: int, length: int, **kwargs) -> None:
+    def cache_insert(self, size: int, length: int, evictions: int, **kwargs) -> None:
         if self.cache_size < size:
             self.cache_size = size
 
         if self.cache_items < length:
             self.cache_items = length
 
+        self.cache_evictions = max(self.cache_evictions, evictions)
+
+    def concurrency_changed(self, jobs: int, previous: int, **kwargs) -> None:
+        self.concurrency_changes += 1
+        self.jobs_min = min(jobs, previous, self.jobs_min if self.jobs_min is not None else previous)
+        self.jobs_max = max(jobs, previous, self.jobs_max if self.jobs_max is not None else previous)
+
     def flush(self):
         stats = dict([(x, y) for x, y in vars(self).items() if not x.startswith('_')])
 
@@ -1,4 +1,4 @@
-# Copyright (c) 2021-2022 Renata Hodovan, Akos Kiss.
+# Copyright (c) 2021-2023 Renata Hodovan, Akos Kiss.
 #
 # Licensed under the BSD 3-Clause License
 # <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
@@ -12,6 +12,8 @@ class Outcome(Enum):
 
     PASS = 'PASS'
     FAIL = 'FAIL'
+    UNKNOWN = 'UNKNOWN'  # E.g., outcome of a cancelled test. Never cached.
+    TIMEOUT = 'TIMEOUT'  # Outcome of a test that exceeded its time limit. Never cached.
 
     def __repr__(self):
         return f'<{self.__class__.__name__}.{self.name}>'
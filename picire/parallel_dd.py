@@ -6,13 +6,19 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
-from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+
+from concurrent.futures import FIRST_COMPLETED, wait
 from os import cpu_count
+from queue import SimpleQueue
 from threading import Lock
 
 from .cache import OutcomeCache
+from .config import ComplementConfig, IntervalConfig, _SplitIndex
 from .dd import DD
 from .outcome import Outcome
+from .reduction_exception import ReductionStopped
+from .scheduler import Scheduler
 
 
 class SharedCache(OutcomeCache):
@@ -45,6 +51,22 @@ class SharedCache(OutcomeCache):
         with self._lock:
             self._cache.clean(config)
 
+    def rebase(self, config):
+        with self._lock:
+            self._cache.rebase(config)
+
+    def evict(self, config):
+        with self._lock:
+            self._cache.evict(config)
+
+    def entry_size(self, config):
+        with self._lock:
+            return self._cache.entry_size(config)
+
+    def get_evictions(self):
+        with self._lock:
+            return self._cache.get_evictions()
+
     def get_size(self):
         with self._lock:
             return self._cache.get_size()
@@ -54,11 +76,34 @@ class SharedCache(OutcomeCache):
             return self._cache.__str__()
 
 
+# The tester of the worker processes of a process pool (set once per worker).
+_worker_test = None
+
+
+def _init_worker(test):
+    global _worker_test  # pylint: disable=global-statement
+    _worker_test = test
+
+
+def _run_worker_test(config, config_id):
+    return _worker_test(config, config_id)
+
+
+def _drain(queue):
+    results = []
+    while not queue.empty():
+        results.append(queue.get())
+    return results
+
+
 class ParallelDD(DD):
 
+    executors = Scheduler.executors
+
     def __init__(self, test, *, split=None, cache=None, id_prefix=None,
-                 config_iterator=None, dd_star=False, stop=None,
-                 proc_num=None, greeddy=False, observer=None):
+                 config_iterator=None, dd_star=False, stop=None, timeout_outcome=Outcome.TIMEOUT,
+                 proc_num=None, greeddy=False, executor='thread', policy=None,
+                 concurrency=None, speculate=False, deterministic=False, observer=None):
         """
         Initialize a ParallelDD object.
 
@@ -70,14 +115,55 @@ class ParallelDD(DD):
             config indices in an arbitrary order.
         :param dd_star: Boolean to enable the DD star algorithm.
         :param stop: A callable invoked before the execution of every test.
+        :param timeout_outcome: How to treat the tests that exceeded their time
+            limit (see :class:`DD`).
         :param proc_num: The level of parallelization.
+        :param greeddy: Merge the reductions of all the failing configurations
+            found by a cycle (validating the merges in parallel), instead of
+            using the first failing configuration only.
+        :param executor: Run tests in a pool of threads ('thread') or of
+            processes ('process'), or as coroutines on an asyncio event loop
+            ('async', see :class:`AsyncParallelDD`). The process pool scales
+            in-process Python testers that would serialize on the GIL, but
+            requires a picklable tester. Only the tester runs in the worker
+            processes: cache lookups, cache updates, and event notifications
+            remain in the reducer, thus the cache is shared by all workers
+            without inter-process communication.
+        :param policy: Scheduling policy that orders the tests waiting for a
+            worker (default: :class:`OrderPolicy`, i.e., config iterator order).
+        :param concurrency: Controller that adapts the number of tests running
+            in parallel to the load of the system (e.g.,
+            :class:`AdaptiveConcurrency`), proc_num being the maximum. Its
+            decisions are reported as 'concurrency_changed' events.
+        :param speculate: Use the workers that would be idle in a cycle to test
+            the candidates of the next cycle (i.e., of the next granularity,
+            which is reached if no failing configuration is found). The
+            outcomes of the speculative tests are cached, and the tests still
+            running when the next cycle starts are taken over by it.
+        :param deterministic: Run the tests of a cycle in parallel but commit
+            their outcomes strictly in the order of the config iterator, thus
+            producing exactly the same result as the sequential :class:`DD`
+            (greedy merging of failing configurations is not performed).
         """
-        super().__init__(test=test, split=split, cache=cache, id_prefix=id_prefix, config_iterator=config_iterator, dd_star=dd_star, stop=stop, observer=observer)
+        super().__init__(test=test, split=split, cache=cache, id_prefix=id_prefix, config_iterator=config_iterator, dd_star=dd_star, stop=stop,
+                         timeout_outcome=timeout_outcome, observer=observer)
         self._cache = SharedCache(self._cache)
 
         self._proc_num = proc_num or cpu_count()
         self.greeddy = greeddy
-
+        self._scheduler = Scheduler(self._proc_num, executor=executor, policy=policy,
+                                    concurrency=concurrency, observer=self._observer,
+                                    initializer=_init_worker, initargs=(self._test,))
+        self._speculate = speculate
+        self._deterministic = deterministic
+        self._speculation = {}  # Speculatively tested configurations to the futures and IDs of their tests.
+
+    def __call__(self, config):
+        try:
+            return super().__call__(config)
+        finally:
+            self._cancel_speculation(self._take_speculation())
+            self._scheduler.shutdown()
 
     def _reduce_config(self, run, subsets, complement_offset):
         """
@@ -91,118 +177,446 @@ class ParallelDD(DD):
         :return: Tuple: (list of subsets composing the failing config or None,
             next complement_offset).
         """
-        n = len(subsets)
-        tests = set()
+        if self._deterministic:
+            return self._reduce_config_in_order(run, subsets, complement_offset)
 
-        progress = []
-        get_fails = lambda : [p[0] for p in progress if p[1] == Outcome.FAIL]
+        n = len(subsets)
+        length = sum(len(s) for s in subsets)
+        split_index = _SplitIndex(subsets)
+        test_info = {}  # Futures of tests in flight to their config indices and IDs.
+        finished = SimpleQueue()  # Futures of finished tests (put by their done-callbacks).
+
+        progress = {}  # Config indices of not passing tests to their outcomes (in submission order).
+        fails = 0  # The number of failing outcomes in progress.
+
+        speculation = self._take_speculation()
+
+        # All candidates are submitted to the scheduler (unless a failing one
+        # is found meanwhile), which orders them by its policy.
+        for i in self._config_iterator(n):
+            fails += self._process_results(_drain(finished), test_info, progress)
+            if fails:
+                break
+
+            if i >= 0:
+                config_id = (f'r{run}', f's{i}')
+                config_set = subsets[i]
+            else:
+                i = (-i - 1 + complement_offset) % n
+                config_id = (f'r{run}', f'c{i}')
+                config_set = ComplementConfig(subsets, i, length - len(subsets[i]), split_index=split_index)
+                i = -i - 1
+
+            # If we checked this test before, return its result
+            outcome = self._lookup_cache(config_set, config_id)
+            if outcome is Outcome.PASS:
+                continue
+            if outcome is Outcome.FAIL:
+                progress[i] = outcome
+                fails += 1
+                break
+
+            progress[i] = None
+            if speculation and IntervalConfig(config_set) in speculation:
+                # Take over the test started speculatively by the previous cycle.
+                test, test_id = speculation.pop(IntervalConfig(config_set))
+            else:
+                test = self._submit_test(config_set, config_id, length)
+                test_id = self._iteration_prefix + config_id
+            test_info[test] = (i, test_id)
+            test.add_done_callback(finished.put)
+
+        # Speculative tests of the previous cycle that are not needed anymore.
+        self._cancel_speculation(speculation)
+
+        if self._speculate and not fails:
+            self._speculate_next_cycle(run, subsets, complement_offset, length, self._scheduler.jobs - len(test_info))
+
+        while test_info and not fails:
+            fails += self._process_results([finished.get()], test_info, progress)
+
+        if fails:
+            # A failing configuration is found, the outcome of the tests
+            # still in flight is irrelevant. Cancel them and move on without
+            # waiting for them (but do use the results that are already
+            # available).
+            self._cancel_tests(list(test_info), test_info)
+            self._cancel_speculation(self._take_speculation())
+            self._process_results(_drain(finished), test_info, progress)
+
+        interesting_indices = [i for i, outcome in progress.items() if outcome is Outcome.FAIL]
+
+        if not interesting_indices:
+            return None, complement_offset
 
-        with ThreadPoolExecutor(self._proc_num) as pool:
-            for i in self._config_iterator(n):
-                results, tests = wait(tests, timeout=0 if len(tests) < self._proc_num else None, return_when=FIRST_COMPLETED)
-                self._process_results(results, progress)
+        return self._greedy_search(run, subsets, interesting_indices, complement_offset)
 
-                if len(get_fails()) > 0:
-                    break
+    def _reduce_config_in_order(self, run, subsets, complement_offset):
+        """
+        Perform the reduce task with tests running in parallel, but with the
+        outcomes evaluated in config iterator order, i.e., as the sequential
+        reduce task would do.
 
-                if i >= 0:
-                    config_id = (f'r{run}', f's{i}')
-                    config_set = subsets[i]
-                else:
-                    i = (-i - 1 + complement_offset) % n
-                    config_id = (f'r{run}', f'c{i}')
-                    config_set = [c for si, s in enumerate(subsets) for c in s if si != i]
-                    i = -i - 1
-
-                # If we checked this test before, return its result
-                content = self._cache._cache._test_builder(config_set)
-                outcome = self._lookup_cache(content, config_id)
-                if outcome is Outcome.PASS:
-                    continue
+        :param run: The index of the current iteration.
+        :param subsets: List of sets that the current configuration is split to.
+        :param complement_offset: A compensation offset needed to calculate the
+            index of the first unchecked complement (optimization purpose only).
+        :return: Tuple: (list of subsets composing the failing config or None,
+            next complement_offset).
+        """
+        n = len(subsets)
+        length = sum(len(s) for s in subsets)
+        split_index = _SplitIndex(subsets)
+        candidates = []  # (index, outcome, test future, test ID) tuples in config iterator order.
+        test_info = {}  # Futures of tests to their config indices and IDs.
+
+        speculation = self._take_speculation()
+        for i in self._config_iterator(n):
+            if i >= 0:
+                config_id = (f'r{run}', f's{i}')
+                config_set = subsets[i]
+            else:
+                i = (-i - 1 + complement_offset) % n
+                config_id = (f'r{run}', f'c{i}')
+                config_set = ComplementConfig(subsets, i, length - len(subsets[i]), split_index=split_index)
+                i = -i - 1
+
+            outcome = self._lookup_cache(config_set, config_id)
+            if outcome is not None:
+                candidates.append((i, outcome, None, None))
                 if outcome is Outcome.FAIL:
-                    progress.append((i, outcome))
+                    # The sequential reduce task would never get further.
                     break
+                continue
 
-                self._check_stop()
+            if speculation and IntervalConfig(config_set) in speculation:
+                test, test_id = speculation.pop(IntervalConfig(config_set))
+            else:
+                test = self._submit_test(config_set, config_id, length)
+                test_id = self._iteration_prefix + config_id
+            candidates.append((i, None, test, test_id))
+            test_info[test] = (i, test_id)
+        self._cancel_speculation(speculation)
+
+        if self._speculate:
+            self._speculate_next_cycle(run, subsets, complement_offset, length, self._scheduler.jobs - len(test_info))
+
+        fvalue = n
+        for ci, (i, outcome, test, _) in enumerate(candidates):
+            if outcome is None:
+                outcome = self._wait_outcome(test, test_info)
+            if outcome is Outcome.FAIL:
+                fvalue = i
+                rest = [c[2] for c in candidates[ci + 1:] if c[2] is not None]
+                self._cancel_tests(rest, test_info)
+                self._cancel_speculation(self._take_speculation())
+                break
+
+        return self._next_subsets(subsets, fvalue, complement_offset)
+
+    def _speculate_next_cycle(self, run, subsets, complement_offset, length, slots):
+        """
+        Speculatively test the candidates of the next cycle that would follow
+        if the current cycle found no failing configuration.
 
-                progress.append((i, None))
-                tests.add(pool.submit(self._test_config_with_index, i, content, config_id))
+        :param run: The index of the current cycle.
+        :param subsets: List of sets that the current configuration is split to.
+        :param complement_offset: The complement offset of the current cycle.
+        :param length: The length of the current configuration.
+        :param slots: The number of tests to start.
+        """
+        if slots <= 0 or len(subsets) >= length:
+            return
+
+        next_subsets = self._split(subsets)
+        split_index = _SplitIndex(next_subsets)
+        n = len(next_subsets)
+        next_offset = (complement_offset * n) // len(subsets)
+        for i in self._config_iterator(n):
+            if slots <= 0:
+                break
+
+            if i >= 0:
+                config_id = (f'r{run}', f'ps{i}')
+                config_set = next_subsets[i]
+            else:
+                i = (-i - 1 + next_offset) % n
+                config_id = (f'r{run}', f'pc{i}')
+                config_set = ComplementConfig(next_subsets, i, length - len(next_subsets[i]), split_index=split_index)
+
+            key = IntervalConfig(config_set)
+            if key in self._speculation or self._cache.lookup(key) is not None:
+                continue
 
-            results, _ = wait(tests, return_when=ALL_COMPLETED)
-            self._process_results(results, progress)
+            self._speculation[key] = (self._submit_test(key, config_id, length, speculative=True), self._iteration_prefix + config_id)
+            slots -= 1
 
-        interesting_indices = get_fails()
+    def _take_speculation(self):
+        """
+        Take over the speculative tests started by the previous cycle.
 
-        if not len(interesting_indices):
-            return None, complement_offset
+        :return: Dictionary mapping the configurations to the futures and IDs
+            of their tests.
+        """
+        speculation, self._speculation = self._speculation, {}
+        return speculation
+
+    def _cancel_speculation(self, speculation):
+        """
+        Cancel speculative tests.
+
+        :param speculation: Dictionary mapping the configurations to the futures
+            and IDs of their tests.
+        """
+        self._cancel_tests([test for test, _ in speculation.values()], {test: (None, test_id) for test, test_id in speculation.values()})
 
-        return self._greedy_search(subsets, n, interesting_indices)
+    def _submit_test(self, config, config_id, length, speculative=False, stoppable=True):
+        """
+        Schedule the test of a configuration.
+
+        :param config: The configuration to test.
+        :param config_id: The ID of the configuration.
+        :param length: The length of the current configuration.
+        :param speculative: Whether the test is speculative.
+        :param stoppable: Whether the stop condition is checked right before
+            the test is started. If the reduction is stopped, the future of
+            the test (and of all other stoppable tests not started yet) raises
+            :class:`ReductionStopped`.
+        :return: Future of the outcome of the test.
+        """
+        kind = config_id[-1][0]
+        stop = self._stop if stoppable else None
+        if self._scheduler.executor == 'thread':
+            return self._scheduler.submit(self._test_config, config, config_id, config=config, kind=kind, length=length, speculative=speculative, stop=stop)
+        if self._scheduler.executor == 'async':
+            return self._scheduler.submit(self._test_config_async, config, config_id, config=config, kind=kind, length=length, speculative=speculative, stop=stop)
+
+        config_id = self._iteration_prefix + config_id
+        self._test_started(config, config_id)
+
+        def _test_not_run(future):
+            if future.cancelled() or isinstance(future.exception(), ReductionStopped):
+                self._test_finished(config, config_id, Outcome.UNKNOWN)
+
+        # NOTE: The outcome is cached and reported by the scheduler before the
+        # future is resolved, so the reducer never acts on an outcome that is
+        # not cached yet.
+        future = self._scheduler.submit(_run_worker_test, config, config_id, config=config, kind=kind, length=length, speculative=speculative, stop=stop,
+                                        finish=lambda outcome: self._test_finished(config, config_id, outcome))
+        future.add_done_callback(_test_not_run)
+        return future
+
+    def _test_config(self, config, config_id):
+        if self._scheduler.executor == 'async':
+            # Tests outside of the cycles (e.g., double-checking the input of
+            # an iteration) have to run on the event loop, too.
+            return self._submit_test(config, config_id, len(config), stoppable=False).result()
+        return super()._test_config(config, config_id)
+
+    async def _test_config_async(self, config, config_id):
+        """
+        Test a single configuration with a coroutine tester and save the
+        result in cache.
+
+        :param config: The current configuration to test.
+        :param config_id: Unique ID that will be used to save tests to easily
+            identifiable directories.
+        :return: PASS or FAIL (or UNKNOWN if the test has been cancelled, or
+            TIMEOUT, see timeout_outcome).
+        """
+        config_id = self._iteration_prefix + config_id
+
+        self._test_started(config, config_id)
+        try:
+            outcome = await self._test(config, config_id)
+        except asyncio.CancelledError:
+            self._test_finished(config, config_id, Outcome.UNKNOWN)
+            raise
+        return self._test_finished(config, config_id, outcome)
+
+    def _cancel_tests(self, tests, test_info):
+        """
+        Cancel tests: the not yet started ones are removed from the scheduler,
+        while the running ones are cancelled by the tester (if it supports
+        cancellation, e.g., :class:`SubprocessTest`). Cancelled tests yield
+        UNKNOWN outcome, which is not cached.
+
+        :param tests: Futures of the tests to cancel.
+        :param test_info: Dictionary mapping futures to the indices and IDs of
+            their configurations.
+        """
+        # NOTE: The tester of the worker processes of a process pool is not
+        # reachable from here, thus only the not yet started tests can be
+        # cancelled there.
+        cancel = getattr(self._test, 'cancel', None) if self._scheduler.executor != 'process' else None
+        for test in tests:
+            # NOTE: Finished tests are not cancelled, as the tester would keep
+            # their IDs forever, waiting for them to start.
+            if not test.cancel() and not test.done() and cancel is not None:
+                cancel(test_info[test][1])
+
+    def _wait_outcome(self, test, test_info):
+        """
+        Wait for the outcome of a test. If the reduction is stopped meanwhile,
+        the other tests are cancelled.
+
+        :param test: Future of the test.
+        :param test_info: Dictionary mapping the futures of the other tests to
+            the indices and IDs of their configurations.
+        :return: The effective outcome of the test.
+        :raises ReductionStopped: If the reduction is stopped before the test
+            is started.
+        """
+        try:
+            return self._effective_outcome(test.result())
+        except ReductionStopped:
+            self._cancel_tests(list(test_info), test_info)
+            raise
 
-    def _test_config_with_index(self, index, config, config_id):
-        return index, self._test_config(config, config_id)
+    def _process_results(self, results, test_info, progress):
+        """
+        Record the outcomes of finished tests.
 
-    def _process_results(self, results, progress):
+        :return: The number of failing outcomes among the results.
+        """
+        fails = 0
         for result in results:
-            index, outcome = result.result()
-            if outcome == Outcome.PASS:
-                progress.remove((index, None))
+            index, _ = test_info.pop(result)
+            if result.cancelled():
                 continue
+            outcome = self._wait_outcome(result, test_info)
+            if outcome is Outcome.PASS:
+                del progress[index]
+            else:
+                progress[index] = outcome
+                if outcome is Outcome.FAIL:
+                    fails += 1
+        return fails
+
+    def _greedy_search(self, run, subsets, interesting_indices, complement_offset):
+        """
+        Merge the reductions of the failing configurations found by a cycle.
+
+        If an interesting subset is found, it is kept as it is the largest
+        possible reduction. Otherwise, the interesting complements are merged,
+        i.e., the union of their removed subsets is removed. As the test is not
+        necessarily monotone, merges are validated in parallel rounds: each
+        round tests removing all prefixes of the not yet merged removals (on top
+        of the already merged ones) at once and adopts the longest failing
+        prefix. The removal that follows it is dropped, since the next longer
+        prefix passed (or was not needed anymore). Thus, at least one removal is
+        settled in each round, and all of them are settled in a single round if
+        the test is monotone.
+
+        :param run: The index of the current iteration.
+        :param subsets: List of sets that the current configuration is split to.
+        :param interesting_indices: Indices of the failing configurations (in
+            the format of :meth:`DD._next_subsets`).
+        :param complement_offset: The current complement offset.
+        :return: Tuple: (list of subsets composing the failing config, next
+            complement_offset).
+        """
+        subset_indices = [i for i in interesting_indices if i >= 0]
+        if subset_indices:
+            return self._next_subsets(subsets, subset_indices[0], complement_offset)
+
+        if not self.greeddy or len(interesting_indices) == 1:
+            return self._next_subsets(subsets, interesting_indices[0], complement_offset)
+
+        removals = [-i - 1 for i in interesting_indices]
+        merged, rest = removals[:1], removals[1:]
+        merge_round = 0
+        while rest:
+            best = self._merge_round(run, merge_round, subsets, merged, rest)
+            merged += rest[:best]
+            rest = rest[best + 1:]
+            merge_round += 1
+
+        merged = set(merged)
+        return [s for i, s in enumerate(subsets) if i not in merged], min(merged)
+
+    def _merge_round(self, run, merge_round, subsets, merged, rest):
+        """
+        Test removing the already merged subsets together with each prefix of
+        the not yet merged ones in parallel.
 
-            index_to_modify = [p[0] for p in progress].index(index)
-            progress[index_to_modify] = (index, outcome)
-
-    def _greedy_search(self, orig_subsets, initial_length, interesting_indices, retest=False):
-        def _get_subsets_with_fvalue(subsets, value):
-            fvalue = value
-            # fvalue contains the index of the cycle in the previous loop
-            # which was found interesting. Otherwise it's n.
-            if fvalue < 0:
-                # Interesting complement is found.
-                # In next run, start removing the following subset
-                fvalue = -fvalue - 1
-                return subsets[:fvalue] + subsets[fvalue + 1:], fvalue
-            if fvalue < initial_length:
-                # Interesting subset is found.
-                fvalue = 0
-                return [subsets[fvalue]], fvalue
-
-        def _perform_test(subsets, index, _fvalue):
-            self._check_stop()
-
-            config_set = [c for s in subsets for c in s]
-            content = self._cache._cache._test_builder(config_set)
-            config_id = (f'd{index}', f'f{_fvalue}')
-            outcome = self._lookup_cache(content, config_id)
-
-            if not outcome:
-                outcome = self._test_config(content, config_id)
-
-            return outcome
-
-        subsets = orig_subsets
-        for i, value in enumerate(interesting_indices):
-            _subsets, _fvalue = _get_subsets_with_fvalue(subsets, value)
-            # The not optimal bad, old method
-            if not self.greeddy:
-                return _subsets, _fvalue
-
-            # DEBUG
-            # outcome = _perform_test(_subsets, i, _fvalue)
-
-            # An item has been already removed from the config
-            if i > 0 and retest:
-                outcome = _perform_test(_subsets, _fvalue, i)
-
-                # Greedily removing the "FAILs" doesn't did the magic.
-                if outcome is Outcome.PASS:
-                    continue
-
-            subsets, fvalue = _subsets, _fvalue
-
-        # Re-test the final result only if the intermediate merges are not tested immediately.
-        if len(interesting_indices) > 1 and not retest:
-            outcome = _perform_test(subsets, fvalue, len(interesting_indices) + 1)
+        :param run: The index of the current iteration.
+        :param merge_round: The index of the current merge round.
+        :param subsets: List of sets that the current configuration is split to.
+        :param merged: Indices of the subsets whose removal is already merged.
+        :param rest: Indices of the subsets whose removal is not yet merged.
+        :return: The length of the longest failing prefix of rest (0 if none of
+            them is failing).
+        """
+        length = sum(len(s) for s in subsets)
+        best = 0
+        tests = set()
+        test_info = {}  # Futures of tests to prefix lengths and IDs.
+        for j in range(len(rest), 0, -1):
+            removed = set(merged).union(rest[:j])
+            config_set = IntervalConfig.concat(s for i, s in enumerate(subsets) if i not in removed)
+            config_id = (f'r{run}', f'm{merge_round}p{j}')
+
+            outcome = self._lookup_cache(config_set, config_id)
+            if outcome is Outcome.FAIL:
+                # Longer prefixes are already submitted, shorter ones are not needed.
+                best = j
+                break
             if outcome is Outcome.PASS:
-                return self._greedy_search(orig_subsets, initial_length, interesting_indices, True)
+                continue
+
+            test = self._submit_test(config_set, config_id, length)
+            tests.add(test)
+            test_info[test] = (j, self._iteration_prefix + config_id)
+
+        while tests:
+            # Tests of prefixes not longer than the longest failing one are
+            # irrelevant anymore.
+            irrelevant = [test for test in tests if test_info[test][0] <= best]
+            self._cancel_tests(irrelevant, test_info)
+            tests.difference_update(irrelevant)
+
+            results, tests = wait(tests, return_when=FIRST_COMPLETED)
+            for result in results:
+                if not result.cancelled() and self._wait_outcome(result, test_info) is Outcome.FAIL:
+                    best = max(best, test_info[result][0])
+
+        return best
 
-        return subsets, fvalue
+
+class AsyncParallelDD(ParallelDD):
+    """
+    Parallel reducer for coroutine testers (e.g., :class:`AsyncSubprocessTest`).
+    The tests are awaited on a single asyncio event loop instead of occupying
+    a thread each, thus thousands of tests can be in flight concurrently
+    (limited by proc_num). The reduction itself can be awaited with
+    :meth:`reduce_async`, in which case the tests run on the event loop of the
+    caller, or it can be run synchronously by calling the reducer, in which
+    case the tests run on a private event loop.
+    """
+
+    def __init__(self, test, **kwargs):
+        """
+        Initialize an AsyncParallelDD object. The arguments are the same as
+        those of :class:`ParallelDD`, except that the executor is always
+        'async'.
+
+        :param test: A callable tester object whose calls are coroutines.
+        """
+        super().__init__(test, executor='async', **kwargs)
+
+    async def reduce_async(self, config):
+        """
+        Reduce the configuration while running the tests on the current event
+        loop. The algorithm itself runs in a worker thread of the event loop,
+        thus the event loop is not blocked.
+
+        :param config: The configuration to reduce.
+        :return: The reduced configuration.
+        """
+        loop = asyncio.get_running_loop()
+        self._scheduler.loop = loop
+        try:
+            return await loop.run_in_executor(None, self, config)
+        finally:
+            self._scheduler.loop = None
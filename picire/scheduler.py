@@ -0,0 +1,495 @@
+# Copyright (c) 2023 Renata Hodovan, Akos Kiss.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+import asyncio
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait as wait_futures
+from heapq import heapify, heappop, heappush
+from itertools import count
+from math import ceil
+from os import cpu_count
+from threading import RLock, Thread
+from time import perf_counter
+
+import psutil
+
+from .outcome import Outcome
+from .subprocess_test import _TEST_MARKER
+
+
+class PolicyRegistry(object):
+    registry = {}
+
+    @classmethod
+    def register(cls, policy_name):
+        def decorator(policy_class):
+            cls.registry[policy_name] = policy_class
+            return policy_class
+        return decorator
+
+
+@PolicyRegistry.register('order')
+class OrderPolicy(object):
+    """
+    Scheduling policy that runs the tests in the order they are submitted
+    (i.e., in the order of the config iterator).
+    """
+
+    def priority(self, config, kind, length):
+        """
+        Compute the priority of a test. Tests with lower priority values run
+        first, tests with equal priority values run in submission order.
+
+        :param config: The configuration to test.
+        :param kind: The kind of the configuration ('s' for subsets, 'c' for
+            complements, 'd' for other derived configurations).
+        :param length: The length of the configuration that the tested one is
+            derived from.
+        :return: A comparable priority value.
+        """
+        return 0
+
+    def update(self, config, kind, outcome, duration):
+        """
+        Learn from the result of a finished test.
+
+        :param config: The tested configuration.
+        :param kind: The kind of the configuration.
+        :param outcome: The outcome of the test.
+        :param duration: The duration of the test (in seconds).
+        """
+
+    def __str__(self):
+        cls = self.__class__
+        return f'{cls.__module__}.{cls.__name__}()'
+
+
+@PolicyRegistry.register('smallest')
+class SmallestFirstPolicy(OrderPolicy):
+    """
+    Scheduling policy that runs the tests of the smallest configurations first.
+    """
+
+    def priority(self, config, kind, length):
+        return len(config)
+
+
+@PolicyRegistry.register('gain')
+class ExpectedGainPolicy(OrderPolicy):
+    """
+    Scheduling policy that runs the tests with the highest expected gain first.
+    The expected gain of a test is the number of atoms it would remove from the
+    current configuration, weighted by the observed (smoothed) rate of failing
+    tests of the same kind.
+    """
+
+    def __init__(self):
+        self._tests = {}
+        self._fails = {}
+
+    def priority(self, config, kind, length):
+        fail_rate = (self._fails.get(kind, 0) + 1) / (self._tests.get(kind, 0) + 2)
+        return -(length - len(config)) * fail_rate
+
+    def update(self, config, kind, outcome, duration):
+        if outcome is Outcome.UNKNOWN:
+            return
+        self._tests[kind] = self._tests.get(kind, 0) + 1
+        if outcome is Outcome.FAIL:
+            self._fails[kind] = self._fails.get(kind, 0) + 1
+
+
+@PolicyRegistry.register('fastest')
+class ShortestDurationPolicy(OrderPolicy):
+    """
+    Scheduling policy that runs the tests with the shortest expected duration
+    first. The duration of a test is predicted from the size of its
+    configuration by a linear model fitted (per configuration kind) to the
+    durations of the previous tests.
+    """
+
+    def __init__(self):
+        self._sums = {}  # Per kind: [n, sum(x), sum(y), sum(x*x), sum(x*y)].
+
+    def priority(self, config, kind, length):
+        x = len(config)
+        n, sx, sy, sxx, sxy = self._sums.get(kind, (0, 0, 0, 0, 0))
+        if n == 0:
+            return x
+        d = n * sxx - sx * sx
+        slope = (n * sxy - sx * sy) / d if d else 0
+        return (sy - slope * sx) / n + slope * x
+
+    def update(self, config, kind, outcome, duration):
+        if outcome is Outcome.UNKNOWN:
+            return
+        x = len(config)
+        sums = self._sums.setdefault(kind, [0, 0, 0, 0, 0])
+        sums[0] += 1
+        sums[1] += x
+        sums[2] += duration
+        sums[3] += x * x
+        sums[4] += x * duration
+
+
+class AdaptiveConcurrency(object):
+    """
+    Controller that adapts the number of tests running in parallel to the load
+    of the system. It observes the CPU utilization, the available memory, and
+    the memory consumed by the running tests (i.e., the resident set size of
+    the processes of the test commands started by the reducer or its workers,
+    divided by the number of running tests), and
+
+    - lowers the number of parallel tests if the available memory drops below
+      the reserve (by as many tests as needed to free up the missing memory),
+    - lowers it by one if the CPU is saturated while more tests run than CPU
+      cores are available,
+    - raises it by one if tests are waiting for a worker, all allowed tests
+      are running, the CPU is not saturated, and the memory is expected to
+      suffice for one more test.
+
+    The number of parallel tests is always kept between a minimum and a
+    maximum, and decisions are made at most once per interval.
+    """
+
+    def __init__(self, max_jobs, *, min_jobs=1, jobs=None, interval=0.5, cpu_limit=90.0, memory_reserve=None):
+        """
+        :param max_jobs: The maximum number of tests to run in parallel.
+        :param min_jobs: The minimum number of tests to run in parallel.
+        :param jobs: The initial number of tests to run in parallel (default:
+            the number of CPU cores, but at most max_jobs).
+        :param interval: The minimum time between two decisions (in seconds).
+        :param cpu_limit: The CPU utilization (in percent) above which the CPU
+            is considered saturated.
+        :param memory_reserve: The amount of memory (in bytes) to keep
+            available (default: 10% of the physical memory).
+        """
+        self.max_jobs = max_jobs
+        self.min_jobs = min(min_jobs, max_jobs)
+        self.interval = interval
+        self.cpu_limit = cpu_limit
+        self.memory_reserve = memory_reserve if memory_reserve is not None else psutil.virtual_memory().total // 10
+        self._jobs = max(self.min_jobs, min(jobs or cpu_count() or 1, max_jobs))
+        self._test_memory = 0
+        self._last = None
+        psutil.cpu_percent(interval=None)  # The first call only starts the measurement.
+
+    @property
+    def jobs(self):
+        """
+        The current number of tests allowed to run in parallel.
+        """
+        return self._jobs
+
+    def adjust(self, running, waiting):
+        """
+        Reconsider the number of parallel tests (unless the last decision was
+        made less than an interval ago).
+
+        :param running: The number of running tests.
+        :param waiting: The number of tests waiting for a worker.
+        :return: None if the number of parallel tests has not changed,
+            otherwise a dictionary describing the decision (with keys 'jobs',
+            'previous', 'reason', 'cpu_percent', 'available_memory', and
+            'test_memory').
+        """
+        now = perf_counter()
+        if self._last is not None and now - self._last < self.interval:
+            return None
+        self._last = now
+
+        cpu_percent, available_memory, test_memory = self._sample(running)
+        if test_memory:
+            # Decaying peak of the memory consumption of a test.
+            self._test_memory = max(test_memory, self._test_memory * 0.9)
+
+        jobs, reason = self._jobs, None
+        if available_memory < self.memory_reserve:
+            missing = self.memory_reserve - available_memory
+            jobs, reason = max(self.min_jobs, jobs - (ceil(missing / self._test_memory) if self._test_memory else 1)), 'memory'
+        elif cpu_percent >= self.cpu_limit and jobs > (cpu_count() or 1):
+            jobs, reason = max(self.min_jobs, jobs - 1), 'cpu'
+        elif waiting and running >= jobs and cpu_percent < self.cpu_limit and available_memory - self._test_memory >= self.memory_reserve:
+            jobs, reason = min(self.max_jobs, jobs + 1), 'idle'
+
+        if jobs == self._jobs:
+            return None
+
+        previous, self._jobs = self._jobs, jobs
+        return {
+            'jobs': jobs,
+            'previous': previous,
+            'reason': reason,
+            'cpu_percent': cpu_percent,
+            'available_memory': available_memory,
+            'test_memory': self._test_memory,
+        }
+
+    def _sample(self, running):
+        """
+        Measure the load of the system.
+
+        :param running: The number of running tests.
+        :return: Tuple: (CPU utilization in percent, available memory in bytes,
+            average memory consumption of the running tests in bytes or 0 if
+            unknown).
+        """
+        test_memory = 0
+        if running:
+            # Only the processes of test commands are measured (i.e., processes
+            # marked by the reducer or one of its descendants, see
+            # SubprocessTest), but not, e.g., the workers of a process pool or
+            # the servers of ServerTest.
+            reducer = psutil.Process()
+            children = reducer.children(recursive=True)
+            owners = {str(process.pid) for process in children + [reducer]}
+            rss = 0
+            for child in children:
+                try:
+                    if child.environ().get(_TEST_MARKER) in owners:
+                        rss += child.memory_info().rss
+                except psutil.Error:
+                    pass  # The process has terminated meanwhile (or cannot be inspected).
+            test_memory = rss // running
+        return psutil.cpu_percent(interval=None), psutil.virtual_memory().available, test_memory
+
+    def __str__(self):
+        cls = self.__class__
+        return f'{cls.__module__}.{cls.__name__}(max_jobs={self.max_jobs}, min_jobs={self.min_jobs})'
+
+
+class _AsyncPool(object):
+    """
+    Executor-like wrapper that runs coroutine functions on an asyncio event
+    loop: either on a given one (which must be running in another thread), or
+    on a private one running in a background thread.
+    """
+
+    def __init__(self, loop=None):
+        self._thread = None
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = Thread(target=loop.run_forever, daemon=True)
+            self._thread.start()
+        self._loop = loop
+        self._futures = set()
+        self._lock = RLock()
+
+    def submit(self, fn, *args):
+        future = asyncio.run_coroutine_threadsafe(fn(*args), self._loop)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            futures = list(self._futures)
+        if not wait:
+            for future in futures:
+                future.cancel()
+        wait_futures(futures)
+
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+
+class Scheduler(object):
+    """
+    Long-lived scheduler that runs tests in a pool of workers. Submitted tests
+    wait in a priority queue ordered by a scheduling policy, and at most as
+    many tests are handed over to the pool as many workers it has, so the pool
+    stays saturated while the queue can still be reordered and tests not yet
+    started can be cancelled. The pool is started lazily and survives until
+    :meth:`shutdown`, i.e., across the cycles and iterations of a reduction.
+    """
+
+    executors = ('thread', 'process', 'async')
+
+    def __init__(self, proc_num, *, executor='thread', policy=None, concurrency=None, observer=None, initializer=None, initargs=(), loop=None):
+        """
+        :param proc_num: The number of workers.
+        :param executor: Run tests in a pool of threads ('thread'), of
+            processes ('process'), or as coroutines on an asyncio event loop
+            ('async'). In the latter case, the submitted callables must be
+            coroutine functions, and proc_num is the number of tests awaited
+            concurrently.
+        :param policy: Scheduling policy (default: :class:`OrderPolicy`).
+        :param concurrency: Controller that adapts the number of tests running
+            in parallel (e.g., :class:`AdaptiveConcurrency`) up to proc_num.
+            If not given, proc_num tests run in parallel.
+        :param observer: Event listener to notify about the decisions of the
+            concurrency controller ('concurrency_changed' event).
+        :param initializer: Callable to initialize the workers with (process
+            pool only).
+        :param initargs: Arguments to the initializer.
+        :param loop: The event loop to run the tests on (async executor only;
+            it must be running in another thread than the one submitting the
+            tests). If not given, a private event loop is run in a background
+            thread.
+        """
+        if executor not in self.executors:
+            raise ValueError(f'Unknown executor: {executor}')
+
+        self._proc_num = proc_num
+        self._executor = executor
+        self._policy = policy or OrderPolicy()
+        self._concurrency = concurrency
+        self._observer = observer
+        self._initializer = initializer
+        self._initargs = initargs
+        self.loop = loop
+        self._pool = None
+        self._queue = []  # Heap of (speculative, priority, sequence number, test) tuples.
+        self._counter = count()
+        self._running = 0
+        self._lock = RLock()
+
+    @property
+    def executor(self):
+        """
+        The kind of the worker pool ('thread', 'process', or 'async').
+        """
+        return self._executor
+
+    @property
+    def jobs(self):
+        """
+        The current number of tests allowed to run in parallel.
+        """
+        if self._concurrency is None:
+            return self._proc_num
+        return min(self._concurrency.jobs, self._proc_num)
+
+    def submit(self, fn, *args, config, kind, length, speculative=False, finish=None, stop=None):
+        """
+        Schedule a test.
+
+        :param fn: The callable to run in a worker. It must return the outcome
+            of the test.
+        :param args: Arguments to fn.
+        :param config: The configuration under test.
+        :param kind: The kind of the configuration (see
+            :meth:`OrderPolicy.priority`).
+        :param length: The length of the configuration that the tested one is
+            derived from.
+        :param speculative: Whether the test is speculative. Speculative tests
+            only run if no other tests are waiting.
+        :param finish: Callable to process the outcome of the test with (e.g.,
+            to cache it) before the future is resolved, i.e., before anyone
+            waiting for the test is woken up. Its return value becomes the
+            result of the future.
+        :param stop: Callable invoked right before the test is started (e.g.,
+            :class:`LimitReduction`). If it raises an exception, the test is
+            not started, and the exception is set on its future and on the
+            futures of all the queued tests that have a stop callable too.
+        :return: Future of the outcome of the test. Cancelling the future
+            succeeds only if the test has not been started yet.
+        """
+        future = Future()
+        with self._lock:
+            heappush(self._queue, (speculative, self._policy.priority(config, kind, length), next(self._counter), (future, fn, args, config, kind, finish, stop)))
+            decision = self._adjust()
+            self._dispatch()
+        self._notify(decision)
+        return future
+
+    def shutdown(self, wait=True):
+        """
+        Cancel the queued tests and stop the pool. The scheduler can be used
+        again afterwards, it starts a new pool when needed.
+
+        :param wait: Wait for the running tests to finish.
+        """
+        with self._lock:
+            queue, self._queue = self._queue, []
+            pool, self._pool = self._pool, None
+        for _, _, _, (future, *_) in queue:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _adjust(self):
+        # NOTE: Must be called with the lock held.
+        if self._concurrency is None:
+            return None
+        return self._concurrency.adjust(self._running, len(self._queue))
+
+    def _notify(self, decision):
+        if decision is not None and self._observer is not None:
+            self._observer.notify('concurrency_changed', decision)
+
+    def _dispatch(self):
+        # NOTE: Must be called with the lock held.
+        while self._running < self.jobs and self._queue:
+            _, _, _, test = heappop(self._queue)
+            future, fn, args = test[:3]
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            stop = test[-1]
+            if stop is not None:
+                try:
+                    stop()
+                except Exception as e:
+                    future.set_exception(e)
+                    self._fail_queue(e)
+                    continue
+
+            if self._pool is None:
+                if self._executor == 'process':
+                    self._pool = ProcessPoolExecutor(self._proc_num, initializer=self._initializer, initargs=self._initargs)
+                elif self._executor == 'async':
+                    self._pool = _AsyncPool(self.loop)
+                else:
+                    self._pool = ThreadPoolExecutor(self._proc_num)
+
+            self._running += 1
+            start = perf_counter()
+            self._pool.submit(fn, *args).add_done_callback(
+                lambda pool_future, test=test, start=start: self._done(pool_future, test, start))
+
+    def _fail_queue(self, exception):
+        # NOTE: Must be called with the lock held. Tests without a stop
+        # condition remain in the queue.
+        queue = self._queue
+        self._queue = [item for item in queue if item[-1][-1] is None]
+        heapify(self._queue)
+        for _, _, _, test in queue:
+            if test[-1] is not None and test[0].set_running_or_notify_cancel():
+                test[0].set_exception(exception)
+
+    def _done(self, pool_future, test, start):
+        duration = perf_counter() - start
+        future, _, _, config, kind, finish, _ = test
+        with self._lock:
+            self._running -= 1
+            outcome = None
+            if not pool_future.cancelled() and pool_future.exception() is None:
+                outcome = pool_future.result()
+                self._policy.update(config, kind, outcome, duration)
+            decision = self._adjust()
+            self._dispatch()
+        self._notify(decision)
+
+        if pool_future.cancelled():
+            future.set_exception(RuntimeError('test has been cancelled by the shutdown of the scheduler'))
+        elif pool_future.exception() is not None:
+            future.set_exception(pool_future.exception())
+        elif finish is not None:
+            try:
+                future.set_result(finish(outcome))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future.set_result(outcome)
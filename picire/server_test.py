@@ -0,0 +1,254 @@
+# Copyright (c) 2023 Renata Hodovan, Akos Kiss.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+import logging
+import os
+import select
+import struct
+
+from subprocess import PIPE, Popen, TimeoutExpired
+from threading import Lock
+from time import monotonic
+
+from .outcome import Outcome
+from .subprocess_test import _kill_process_group
+
+logger = logging.getLogger(__name__)
+
+# Writes to a pipe of at most this size do not block if the pipe is writable.
+_PIPE_BUF = getattr(select, 'PIPE_BUF', 512)
+
+# Valid responses (both of them are 4 bytes long).
+_RESPONSES = {b'FAIL': Outcome.FAIL, b'PASS': Outcome.PASS}
+_RESPONSE_LENGTH = 4
+
+
+class ServerTest(object):
+    """
+    Tester that keeps the tester command of the user resident (as a server)
+    instead of starting it for every test, thus amortizing its startup cost
+    (e.g., of JVM- or Python-based oracles).
+
+    The server reads requests from its standard input and writes responses to
+    its standard output, until its standard input is closed. A request is the
+    test case, and a response is either ``FAIL`` or ``PASS`` (in ASCII), both
+    prefixed with their length in bytes as a 4-byte big-endian unsigned
+    integer.
+
+    A server is started for every concurrently running test (e.g., by the
+    workers of :class:`ParallelDD`), and idle servers are reused by the
+    subsequent tests. If a server crashes, responds invalidly, or does not
+    respond in time, it is killed and the test is retried with a new server. A
+    test that exhausts its retries is considered TIMEOUT if its last server
+    did not respond in time, otherwise the test fails with an error (as the
+    server is broken).
+    """
+
+    def __init__(self, *, test_builder, command, work_dir=None, encoding='utf-8', timeout=None, retries=1):
+        """
+        :param test_builder: Callable object that creates test case from a
+            configuration.
+        :param command: The server command as a sequence of arguments.
+        :param work_dir: The working directory of the servers (default: the
+            current working directory).
+        :param encoding: The encoding of the test cases in the requests.
+        :param timeout: The time limit of a request (in seconds; default: no
+            limit). It is enforced on POSIX systems only.
+        :param retries: The number of times a test is retried with a new
+            server if its server fails.
+        """
+        self.test_builder = test_builder
+        self.command = command
+        self.work_dir = work_dir
+        self.encoding = encoding
+        self.timeout = timeout
+        self.retries = retries
+        if work_dir:
+            os.makedirs(work_dir, exist_ok=True)
+        self._init_state()
+
+    def _init_state(self):
+        self._lock = Lock()
+        self._idle = []  # Servers waiting for a request.
+        self._busy = {}  # Servers serving a request by config IDs.
+        self._cancelled = set()  # IDs of the cancelled tests.
+        self.starts = 0  # The number of servers started so far.
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('_lock', '_idle', '_busy', '_cancelled', 'starts'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def __call__(self, config, config_id):
+        """
+        Send the test case of the configuration to a server and get its
+        outcome.
+
+        :param config: The configuration to test.
+        :param config_id: Unique ID of the configuration.
+        :return: The evaluation of the current test. It's either FAIL or PASS
+            (or UNKNOWN if the test has been cancelled, or TIMEOUT if the
+            servers have not responded in time).
+        :raises RuntimeError: If the servers have crashed or responded
+            invalidly in all retries.
+        """
+        request = self.test_builder(config).encode(self.encoding, errors='ignore')
+
+        error = None
+        for _ in range(self.retries + 1):
+            with self._lock:
+                if config_id in self._cancelled:
+                    self._cancelled.discard(config_id)
+                    return Outcome.UNKNOWN
+                server = self._idle.pop() if self._idle else None
+                if server is None:
+                    self.starts += 1
+
+            if server is None:
+                server = _Server(self.command, self.work_dir)
+            with self._lock:
+                self._busy[config_id] = server
+                if config_id in self._cancelled:
+                    # Cancelled while the server was being started.
+                    server.kill()
+
+            outcome, error = None, None
+            try:
+                outcome = server.request(request, self.timeout)
+            except _ServerError as e:
+                error = e
+
+            with self._lock:
+                del self._busy[config_id]
+                cancelled = config_id in self._cancelled
+                self._cancelled.discard(config_id)
+                if outcome is not None and not cancelled:
+                    self._idle.append(server)
+                    return outcome
+
+            server.kill()
+            server.close()
+            if cancelled:
+                return Outcome.UNKNOWN
+            logger.warning('Test server failed, restarting it: %s', error)
+
+        if isinstance(error, _ServerTimeout):
+            return Outcome.TIMEOUT
+        raise RuntimeError(f'Test server failed {self.retries + 1} times: {error}') from error
+
+    def cancel(self, config_id):
+        """
+        Cancel a test: kill its server if it is already being served, or
+        prevent it from starting otherwise. The cancelled test returns UNKNOWN.
+
+        :param config_id: Unique ID of the configuration whose test to cancel.
+        """
+        with self._lock:
+            self._cancelled.add(config_id)
+            server = self._busy.get(config_id)
+            if server is not None:
+                server.kill()
+
+    def close(self):
+        """
+        Stop all the servers.
+        """
+        with self._lock:
+            servers = self._idle + list(self._busy.values())
+            self._idle = []
+        for server in servers:
+            server.close()
+
+
+class _ServerError(Exception):
+    pass
+
+
+class _ServerTimeout(_ServerError):
+    pass
+
+
+class _Server(object):
+    """
+    A running server process of :class:`ServerTest`.
+    """
+
+    def __init__(self, command, cwd):
+        # The server runs in its own process group (session), so that killing
+        # it kills all the processes it spawned.
+        self._proc = Popen(command, stdin=PIPE, stdout=PIPE, cwd=cwd, bufsize=0, start_new_session=True)
+
+    def request(self, content, timeout):
+        """
+        Send a request to the server and wait for its response.
+
+        :param content: The test case (as bytes).
+        :param timeout: The time limit of the request (in seconds, or None).
+        :return: The outcome sent by the server.
+        """
+        deadline = monotonic() + timeout if timeout is not None else None
+        self._write(struct.pack('>I', len(content)) + content, deadline)
+        header = self._read(4, deadline)
+        length, = struct.unpack('>I', header)
+        if length != _RESPONSE_LENGTH:
+            # E.g., the server writes something else to its output. Reading
+            # such a length would block (forever if there is no timeout).
+            raise _ServerError(f'invalid response header: {header!r}')
+        response = self._read(length, deadline)
+        if response not in _RESPONSES:
+            raise _ServerError(f'invalid response: {response!r}')
+        return _RESPONSES[response]
+
+    def kill(self):
+        _kill_process_group(self._proc)
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+            self._proc.wait(timeout=1)
+        except (OSError, TimeoutExpired):
+            self.kill()
+            self._proc.wait()
+        self._proc.stdout.close()
+
+    def _write(self, data, deadline):
+        fd = self._proc.stdin.fileno()
+        view = memoryview(data)
+        try:
+            while view:
+                self._wait(fd, True, deadline)
+                view = view[os.write(fd, view[:_PIPE_BUF]):]
+        except OSError as e:
+            raise _ServerError(f'server exited ({e})') from e
+
+    def _read(self, size, deadline):
+        fd = self._proc.stdout.fileno()
+        chunks = []
+        while size:
+            self._wait(fd, False, deadline)
+            chunk = os.read(fd, size)
+            if not chunk:
+                raise _ServerError('server closed its output')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _wait(fd, write, deadline):
+        if deadline is None or os.name != 'posix':
+            return
+        remaining = deadline - monotonic()
+        if remaining > 0:
+            readable, writable, _ = select.select([] if write else [fd], [fd] if write else [], [], remaining)
+            if readable or writable:
+                return
+        raise _ServerTimeout('timeout')
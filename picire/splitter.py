@@ -5,6 +5,9 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
+from .config import IntervalConfig
+
+
 class SplitterRegistry(object):
     registry = {}
 
@@ -39,7 +42,7 @@ class ZellerSplit(object):
         :param subsets: List of sets that the current configuration is split to.
         :return: List of newly split sets.
         """
-        config = [c for s in subsets for c in s]
+        config = IntervalConfig.concat(subsets)
         length = len(config)
         n = min(length, len(subsets) * self._n)
 
@@ -78,7 +81,7 @@ class BalancedSplit(object):
         :param subsets: List of sets that the current configuration is split to.
         :return: List of newly split sets.
         """
-        config = [c for s in subsets for c in s]
+        config = IntervalConfig.concat(subsets)
         length = len(config)
         n = min(length, len(subsets) * self._n)
 
@@ -1,22 +1,50 @@
-# Copyright (c) 2016-2021 Renata Hodovan, Akos Kiss.
+# Copyright (c) 2016-2023 Renata Hodovan, Akos Kiss.
 #
 # Licensed under the BSD 3-Clause License
 # <LICENSE.rst or https://opensource.org/licenses/BSD-3-Clause>.
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
+import asyncio
 import codecs
+import logging
 import os
 import shutil
+import signal
+import struct
 
-from subprocess import run
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from hashlib import sha3_256
+from itertools import accumulate, count, islice
+from operator import lt
+from queue import Queue
+from subprocess import PIPE, Popen, TimeoutExpired
+from tempfile import mkdtemp
+from threading import Lock, Thread
 
+from .config import ComplementConfig, IntervalConfig
 from .outcome import Outcome
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Environment variable holding the ID of the process that started a test
+# command (inherited by all the processes of the test command).
+_TEST_MARKER = 'PICIRE_TEST_PARENT'
+
 
 class SubprocessTest(object):
 
-    def __init__(self, *, test_builder, command_pattern, work_dir, filename, encoding='utf-8', cleanup=True):
+    deliveries = ('file', 'stdin', 'memfd')
+
+    def __init__(self, *, test_builder, command_pattern, work_dir, filename, encoding='utf-8', cleanup=True,
+                 reuse_dirs=False, scratch_dir=None, delivery='file', timeout=None, cpu_limit=None, memory_limit=None):
         """
         Wrapper around the script provided by the user. It decides about the
         interestingness based on the return code of executed script.
@@ -31,13 +59,100 @@ class SubprocessTest(object):
         :param encoding: The encoding that will be used to save the tests.
         :param cleanup: Binary flag denoting whether the test directory should
             be removed after test execution or not.
+        :param reuse_dirs: Run the tests in a pool of reused scratch directories
+            (one per concurrently running test) instead of creating and
+            removing a directory named after the config ID for every test.
+            Scratch directories are only replaced if the test command leaves
+            files behind in them, and their removal (or, if cleanup is
+            disabled, their move to the config ID-named directory in work_dir)
+            happens in a background thread. Call :meth:`close` to wait for the
+            background jobs and to remove the scratch directories.
+        :param scratch_dir: The directory to create the scratch directories in
+            (e.g., /dev/shm to keep them in memory; default: work_dir).
+        :param delivery: How to pass the test case to the tester command:
+            saved to a file ('file'), streamed to its standard input ('stdin',
+            %s is substituted with /dev/stdin), or in an anonymous in-memory
+            file ('memfd', Linux only, %s is substituted with a
+            /proc/self/fd/N path). Unless cleanup is disabled, the latter two
+            do not write the test cases to disk, and the tester command runs
+            in work_dir.
+        :param timeout: Wall-clock time limit of a test (in seconds; default: no
+            limit). If it is exceeded, the process group of the tester command
+            is killed and the test returns TIMEOUT.
+        :param cpu_limit: CPU time limit of the tester command (in seconds,
+            RLIMIT_CPU; POSIX only; default: no limit).
+        :param memory_limit: Address space limit of the tester command (in
+            bytes, rounded down to KiB, RLIMIT_AS; POSIX only; default: no
+            limit).
         """
+        if delivery not in self.deliveries:
+            raise ValueError(f'Unknown delivery mode: {delivery}')
+        if delivery == 'memfd' and not hasattr(os, 'memfd_create'):
+            raise ValueError('memfd delivery is not supported on this platform')
+        if cpu_limit is not None or memory_limit is not None:
+            if resource is None:
+                raise ValueError('Resource limits are not supported on this platform')
+            # NOTE: The limits are set by a shell right before it executes the
+            # tester command (see _limit_command), and it cannot raise the
+            # hard limits inherited from this process.
+            for limit, value in ((resource.RLIMIT_CPU, cpu_limit + 1 if cpu_limit is not None else None), (resource.RLIMIT_AS, memory_limit)):
+                _, hard = resource.getrlimit(limit)
+                if value is not None and hard != resource.RLIM_INFINITY and hard < value:
+                    raise ValueError(f'Resource limit {value} exceeds the hard limit {hard} of the current process')
+
         self.test_builder = test_builder
         self.command_pattern = command_pattern
         self.work_dir = work_dir
         self.filename = filename
         self.encoding = encoding
         self.cleanup = cleanup
+        self.reuse_dirs = reuse_dirs and delivery == 'file'
+        self.delivery = delivery
+        self.timeout = timeout
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self._scratch_root = None
+        if delivery != 'file':
+            os.makedirs(work_dir, exist_ok=True)
+        elif reuse_dirs:
+            scratch_dir = scratch_dir or work_dir
+            os.makedirs(scratch_dir, exist_ok=True)
+            self._scratch_root = mkdtemp(prefix='picire-', dir=scratch_dir)
+        self._init_state()
+        self._background = _BackgroundJobs()
+
+    def _init_state(self):
+        self._lock = Lock()
+        self._procs = {}  # Processes of the running tests by config IDs.
+        self._cancelled = set()  # IDs of the cancelled tests.
+        self._free_dirs = []  # Scratch directories not in use (paths, and whether they exist).
+        self._dir_counter = count()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('_lock', '_procs', '_cancelled', '_free_dirs', '_dir_counter', '_background'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+        # NOTE: Copies of the tester (e.g., in the workers of a process pool)
+        # run their file system jobs synchronously, as their background
+        # threads could be killed with pending jobs.
+        self._background = None
+
+    def close(self):
+        """
+        Wait for the background file system jobs to finish and remove the
+        scratch directories (if directories are reused).
+        """
+        if self._background is not None:
+            self._background.join()
+        if self._scratch_root is not None:
+            shutil.rmtree(self._scratch_root, ignore_errors=True)
+            with self._lock:
+                self._free_dirs = []
 
     def __call__(self, config, config_id):
         """
@@ -47,18 +162,97 @@ class SubprocessTest(object):
             compiled into a single test.
         :param config_id: Unique ID of the current configuration. It's used to
             name the containing folder of the current test.
-        :return: The evaluation of the current test. It's either FAIL or PASS.
+        :return: The evaluation of the current test. It's either FAIL or PASS
+            (or UNKNOWN if the test has been cancelled, or TIMEOUT if it has
+            exceeded its time limit).
         """
+        run = self._prepare(config, config_id)
 
-        test_dir = os.path.join(self.work_dir, '_'.join(str(i) for i in config_id))
-        test_path = os.path.join(test_dir, self.filename)
+        returncode = None
+        timed_out = False
+        with self._lock:
+            cancelled = config_id in self._cancelled
+
+        if not cancelled:
+            # The test command runs in its own process group (session), so
+            # that cancellation can kill all the processes it spawned. The
+            # process is spawned without holding the lock, so that the workers
+            # do not wait for each other (or for cancellations).
+            try:
+                proc = Popen(run.args, cwd=run.cwd, stdin=PIPE if run.stdin is not None else None, pass_fds=run.fds, env=_test_env(), start_new_session=True)
+            finally:
+                run.close_fds()
+            with self._lock:
+                self._procs[config_id] = proc
+                if config_id in self._cancelled:
+                    # Cancelled while the process was being started.
+                    _kill_process_group(proc)
+
+            try:
+                proc.communicate(run.stdin, timeout=self.timeout)
+                returncode = proc.returncode
+            except TimeoutExpired:
+                _kill_process_group(proc)
+                proc.communicate()
+                timed_out = True
+            with self._lock:
+                del self._procs[config_id]
 
-        os.makedirs(test_dir, exist_ok=True)
+        return self._finish(config_id, run, returncode, timed_out)
 
+    def _prepare(self, config, config_id):
+        """
+        Deliver the test case of the configuration (e.g., save it) and assemble
+        the test command.
+
+        :param config: The configuration to test.
+        :param config_id: Unique ID of the configuration.
+        :return: The description of the test run.
+        """
+        if self.delivery != 'file':
+            return self._prepare_in_memory(config, config_id)
+
+        if self.reuse_dirs:
+            with self._lock:
+                test_dir, exists = self._free_dirs.pop() if self._free_dirs else (None, False)
+            if test_dir is None:
+                test_dir = os.path.join(self._scratch_root, f'{os.getpid()}-{next(self._dir_counter)}')
+            if not exists:
+                os.makedirs(test_dir, exist_ok=True)
+        else:
+            test_dir = os.path.join(self.work_dir, '_'.join(str(i) for i in config_id))
+            os.makedirs(test_dir, exist_ok=True)
+
+        test_path = os.path.join(test_dir, self.filename)
         with codecs.open(test_path, 'w', encoding=self.encoding, errors='ignore') as f:
-            # f.write(self.test_builder(config))
-            f.write(config)
+            f.write(self.test_builder(config))
+
+        return _TestRun(test_dir=test_dir, cwd=test_dir, args=self._args(test_path))
+
+    def _prepare_in_memory(self, config, config_id):
+        """
+        Prepare the delivery of the test case of the configuration via the
+        standard input or an anonymous in-memory file of the tester command.
 
+        :param config: The configuration to test.
+        :param config_id: Unique ID of the configuration.
+        :return: The description of the test run.
+        """
+        test = self.test_builder(config)
+        if not self.cleanup:
+            # Keep the test case on disk for inspection, but off the critical path.
+            self._run_job(_save_test, os.path.join(self.work_dir, '_'.join(str(i) for i in config_id)), self.filename, test, self.encoding)
+        content = test.encode(self.encoding, errors='ignore')
+
+        if self.delivery == 'stdin':
+            return _TestRun(cwd=self.work_dir, args=self._args('/dev/stdin'), stdin=content)
+
+        fd = os.memfd_create('picire-test')
+        with open(fd, 'wb', closefd=False) as f:
+            f.write(content)
+        return _TestRun(cwd=self.work_dir, args=self._args(f'/proc/self/fd/{fd}'), fds=(fd,))
+
+    def _args(self, test_path):
         args = []
         for arg in self.command_pattern:
             try:
@@ -66,28 +260,365 @@ class SubprocessTest(object):
             except TypeError:
                 pass
             args.append(arg)
-        returncode = run(args, cwd=test_dir, check=False).returncode
+        return _limit_command(args, self.cpu_limit, self.memory_limit)
 
-        if self.cleanup:
-            shutil.rmtree(test_dir)
+    def _finish(self, config_id, run, returncode, timed_out=False):
+        """
+        Clean up after a test and determine its outcome.
+
+        :param config_id: Unique ID of the tested configuration.
+        :param run: The description of the test run.
+        :param returncode: The exit code of the test command (None if it has
+            not been started or has been killed).
+        :param timed_out: Whether the test command has exceeded its time limit.
+        :return: FAIL, PASS, UNKNOWN (if the test has been cancelled), or
+            TIMEOUT.
+        """
+        with self._lock:
+            cancelled = config_id in self._cancelled
+            self._cancelled.discard(config_id)
+
+        run.close_fds()
+        if run.test_dir is not None:
+            if self.reuse_dirs:
+                self._release_dir(config_id, run.test_dir)
+            elif self.cleanup:
+                shutil.rmtree(run.test_dir)
 
         # Determine outcome.
+        if cancelled:
+            return Outcome.UNKNOWN
+        if timed_out:
+            return Outcome.TIMEOUT
+        if returncode is None:
+            return Outcome.UNKNOWN
         return Outcome.FAIL if returncode == 0 else Outcome.PASS
 
+    def cancel(self, config_id):
+        """
+        Cancel a test: kill the process group of its command if it is already
+        running, or prevent it from starting otherwise. The cancelled test
+        returns UNKNOWN. Tests that have already finished must not be
+        cancelled, as their IDs would be kept until a test with the same ID
+        finishes.
+
+        :param config_id: Unique ID of the configuration whose test to cancel.
+        """
+        with self._lock:
+            self._cancelled.add(config_id)
+            proc = self._procs.get(config_id)
+            if proc is not None:
+                _kill_process_group(proc)
+
+    def _release_dir(self, config_id, test_dir):
+        """
+        Give a scratch directory back to the pool. If its contents have to be
+        kept or removed, the directory is renamed out of the way (which is
+        cheap), and the rest of the work is left to the background thread.
+
+        :param config_id: Unique ID of the tested configuration.
+        :param test_dir: The scratch directory of the test.
+        """
+        if self.cleanup:
+            with os.scandir(test_dir) as entries:
+                dirty = any(entry.name != self.filename for entry in entries)
+            if dirty:
+                trash_dir = f'{test_dir}.{next(self._dir_counter)}'
+                os.rename(test_dir, trash_dir)
+                self._run_job(shutil.rmtree, trash_dir, True)
+        else:
+            kept_dir = f'{test_dir}.{next(self._dir_counter)}'
+            os.rename(test_dir, kept_dir)
+            self._run_job(_move_dir, kept_dir, os.path.join(self.work_dir, '_'.join(str(i) for i in config_id)))
+            dirty = True
+
+        with self._lock:
+            self._free_dirs.append((test_dir, not dirty))
+
+    def _run_job(self, fn, *args):
+        if self._background is not None:
+            self._background.submit(fn, *args)
+        else:
+            fn(*args)
+
+
+class _TestRun(object):
+    """
+    Description of how to run the tester command on a test case.
+    """
+
+    __slots__ = ('test_dir', 'cwd', 'args', 'stdin', 'fds')
+
+    def __init__(self, *, cwd, args, test_dir=None, stdin=None, fds=()):
+        """
+        :param cwd: The working directory of the tester command.
+        :param args: The tester command as a sequence of arguments.
+        :param test_dir: The test directory (None if the test case is not
+            saved to disk).
+        :param stdin: Content to stream to the standard input of the tester
+            command (None if nothing).
+        :param fds: File descriptors to pass to the tester command (they are
+            closed by :meth:`close_fds`).
+        """
+        self.test_dir = test_dir
+        self.cwd = cwd
+        self.args = args
+        self.stdin = stdin
+        self.fds = fds
+
+    def close_fds(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = ()
+
+
+class _BackgroundJobs(object):
+    """
+    Runs jobs (e.g., file system cleanup) one after the other in a background
+    thread, which is started when the first job is submitted.
+    """
+
+    def __init__(self):
+        self._queue = Queue()
+        self._thread = None
+        self._lock = Lock()
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put((fn, args))
+
+    def join(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            fn, args = self._queue.get()
+            try:
+                fn(*args)
+            except OSError as e:
+                logger.warning('Background file system job failed: %s', e)
+            finally:
+                self._queue.task_done()
+
+
+def _save_test(test_dir, filename, test, encoding):
+    os.makedirs(test_dir, exist_ok=True)
+    with codecs.open(os.path.join(test_dir, filename), 'w', encoding=encoding, errors='ignore') as f:
+        f.write(test)
+
+
+def _move_dir(src, dst):
+    if os.path.exists(dst):
+        shutil.rmtree(dst)
+    shutil.move(src, dst)
+
+
+class AsyncSubprocessTest(SubprocessTest):
+    """
+    Variant of :class:`SubprocessTest` whose calls are coroutines, i.e., the
+    test commands are awaited on an asyncio event loop instead of blocking a
+    thread each (see :class:`AsyncParallelDD`). A test is cancelled either by
+    :meth:`cancel` or by cancelling the task awaiting it; in both cases, the
+    process group of its command is killed. The file system work of the tests
+    (saving the test cases and cleaning up after them) runs in a thread pool
+    of the tester, so that it does not block the event loop.
+    """
+
+    def _init_state(self):
+        super()._init_state()
+        self._executor = None  # Thread pool of the file system work (started when first needed).
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state['_executor']
+        return state
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        super().close()
+
+    def _run_in_executor(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(thread_name_prefix='picire-fs')
+            executor = self._executor
+        return asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def _finish_later(self, config_id, prepared):
+        # Clean up after a cancelled test once its preparation is done.
+        if not prepared.cancelled() and prepared.exception() is None:
+            self._run_in_executor(self._finish, config_id, prepared.result(), None)
+
+    async def __call__(self, config, config_id):  # pylint: disable=invalid-overridden-method
+        """
+        Saving and evaluating of the current configuration.
+
+        :param config: The list of units (chars or lines) that have to be
+            compiled into a single test.
+        :param config_id: Unique ID of the current configuration. It's used to
+            name the containing folder of the current test.
+        :return: The evaluation of the current test. It's either FAIL or PASS
+            (or UNKNOWN if the test has been cancelled, or TIMEOUT if it has
+            exceeded its time limit).
+        """
+        prepared = self._run_in_executor(self._prepare, config, config_id)
+        try:
+            # NOTE: The preparation is shielded from the cancellation of the
+            # test, so that its result can be cleaned up.
+            run = await asyncio.shield(prepared)
+        except asyncio.CancelledError:
+            prepared.add_done_callback(partial(self._finish_later, config_id))
+            raise
+
+        returncode = None
+        timed_out = False
+        with self._lock:
+            cancelled = config_id in self._cancelled
+
+        if not cancelled:
+            # The test command runs in its own process group (session), so
+            # that cancellation can kill all the processes it spawned.
+            try:
+                proc = await asyncio.create_subprocess_exec(run.args[0], *run.args[1:], cwd=run.cwd, stdin=PIPE if run.stdin is not None else None,
+                                                            pass_fds=run.fds, env=_test_env(), start_new_session=True)
+            finally:
+                run.close_fds()
+            with self._lock:
+                self._procs[config_id] = proc
+                if config_id in self._cancelled:
+                    # Cancelled while the process was being started.
+                    _kill_process_group(proc)
+
+            try:
+                await asyncio.wait_for(proc.communicate(run.stdin), self.timeout)
+                returncode = proc.returncode
+            except asyncio.TimeoutError:
+                _kill_process_group(proc)
+                await proc.wait()
+                timed_out = True
+            except asyncio.CancelledError:
+                _kill_process_group(proc)
+                with self._lock:
+                    del self._procs[config_id]
+                self._run_in_executor(self._finish, config_id, run, None)
+                raise
+            with self._lock:
+                del self._procs[config_id]
+
+        return await asyncio.shield(self._run_in_executor(self._finish, config_id, run, returncode, timed_out))
+
+
+def _limit_command(args, cpu_limit, memory_limit):
+    """
+    Wrap a command so that a shell sets its resource limits and then executes
+    it. Thus, the limits are in effect before the command starts (unlike if
+    they were applied to the started process), and the child process does not
+    run Python code before executing the shell (unlike a preexec_fn, which is
+    unsafe in a process with threads).
+
+    :param args: The command as a sequence of arguments.
+    :param cpu_limit: CPU time limit (in seconds, or None).
+    :param memory_limit: Address space limit (in bytes, or None).
+    :return: The wrapped command (or the command itself if it has no limits).
+    """
+    limits = []
+    if cpu_limit is not None:
+        # SIGXCPU at the soft limit, SIGKILL at the hard limit. (The soft
+        # limit is lowered first, as it must not exceed the hard limit.)
+        limits += [f'ulimit -S -t {cpu_limit}', f'ulimit -H -t {cpu_limit + 1}']
+    if memory_limit is not None:
+        limits.append(f'ulimit -v {memory_limit // 1024}')
+    if not limits:
+        return args
+    return ['/bin/sh', '-c', ' && '.join(limits + ['exec "$@"']), 'picire-limits'] + args
+
+
+def _test_env():
+    """
+    Build the environment of a test command: the environment of the reducer
+    with the ID of the current process added, so that the processes of the
+    test command can be told apart from other child processes of the reducer
+    (see :class:`AdaptiveConcurrency`).
+    """
+    return dict(os.environ, **{_TEST_MARKER: str(os.getpid())})
+
+
+def _kill_process_group(proc):
+    if os.name == 'posix':
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        proc.kill()
+
+
+_HASH_MOD = (1 << 61) - 1
+_HASH_BASES = (0x1f3d5b79a2c4e6f, 0x0a5c3e7f9b1d2f4)
+
+
+def _iter_runs(config):
+    return config.iter_runs() if isinstance(config, IntervalConfig) else iter(IntervalConfig(config).runs)
+
 
 class ConcatTestBuilder(object):
     """
     Callable class that builds test case from a configuration.
+
+    The atoms are stored joined into a single string together with the offsets
+    of their boundaries. Thus, a contiguous run of atoms is assembled by a
+    single slicing of the string, and the cost of building a test case depends
+    on the number of runs in the configuration instead of the number of atoms.
+    Complements are assembled from the test cases of the subsets of the current
+    split. Moreover, the test cases of the most recently built configurations
+    are memoized, as the same configuration object is usually built several
+    times in a row (e.g., by the cache and then by the tester).
     """
 
-    def __init__(self, content):
+    def __init__(self, content, *, memo_size=16):
         """
         Initialize a test builder with the atoms (e.g. chars or lines) of the
         original test case.
 
         :param content: Atoms of the original test case.
+        :param memo_size: The number of most recently built test cases to keep.
+            (Configurations are identified by object identity, thus, they must
+            not be modified after they have been built.)
         """
         self._content = content
+        self._text = ''.join(content)
+        if isinstance(content, str):
+            self._offsets = range(len(content) + 1)
+        else:
+            self._offsets = [0] + list(accumulate(len(atom) for atom in content))
+        self._memo_size = memo_size
+        self._memo = {}
+        self._split = None
+        self._split_tests = None
+        self._hash_prefixes = None
+        self._lock = Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled, and memoized and derived data are cheaper to
+        # recompute than to transfer (e.g., to the workers of a process pool).
+        state = self.__dict__.copy()
+        for key in ('_memo', '_split', '_split_tests', '_hash_prefixes', '_lock'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._memo = {}
+        self._split = None
+        self._split_tests = None
+        self._hash_prefixes = None
+        self._lock = Lock()
 
     def __call__(self, config):
         """
@@ -96,4 +627,128 @@ class ConcatTestBuilder(object):
         :param config: Configuration to build a test case from.
         :return: Test case described by the config.
         """
+        with self._lock:
+            memo = self._memo.get(id(config))
+        if memo is not None and memo[0] is config:
+            return memo[1]
+
+        if isinstance(config, ComplementConfig):
+            test = self._build_complement(config)
+        else:
+            test = self._build(config)
+
+        with self._lock:
+            self._memo[id(config)] = (config, test)
+            while len(self._memo) > self._memo_size:
+                del self._memo[next(iter(self._memo))]
+        return test
+
+    def content_length(self, config):
+        """
+        Compute the length of the test case of the given config without
+        building it.
+
+        :param config: Configuration to compute the test case length of.
+        :return: Length of the test case described by the config.
+        """
+        offsets = self._offsets
+        return sum(offsets[stop] - offsets[start] for start, stop in _iter_runs(config))
+
+    def content_hash(self, config):
+        """
+        Compute the hash of the test case of the given config without building
+        it. The hash is a polynomial rolling hash of the characters of the test
+        case (computed with two bases modulo a Mersenne prime), thus it depends
+        only on the test case and not on how it is split up into atoms. The
+        hashes of the prefixes of the original test case are computed once, and
+        then the hash of every contiguous run of atoms is derived from them in
+        constant time. Finally, the two rolling hashes and the length of the
+        test case are mixed with SHA3.
+
+        :param config: Configuration to compute the test case hash of.
+        :return: Tuple of the hash (as bytes) and the length of the test case
+            described by the config.
+        """
+        if self._hash_prefixes is None:
+            self._compute_hash_prefixes()
+        offsets = self._offsets
+        hashes = [0] * len(_HASH_BASES)
+        length = 0
+        for start, stop in _iter_runs(config):
+            run_length = offsets[stop] - offsets[start]
+            for i, (base, prefix) in enumerate(zip(_HASH_BASES, self._hash_prefixes)):
+                shift = pow(base, run_length, _HASH_MOD)
+                hashes[i] = (hashes[i] * shift + prefix[stop] - prefix[start] * shift) % _HASH_MOD
+            length += run_length
+        return sha3_256(struct.pack('>QQQ', hashes[0], hashes[1], length)).digest(), length
+
+    def _compute_hash_prefixes(self):
+        with self._lock:
+            if self._hash_prefixes is not None:
+                return
+            hash_prefixes = []
+            for base in _HASH_BASES:
+                h = 0
+                prefix = array('Q', [h])
+                for atom in self._content:
+                    # NOTE: Characters are offset by one, so that NUL characters
+                    # change the hash too.
+                    for c in map(ord, atom):
+                        h = (h * base + c + 1) % _HASH_MOD
+                    prefix.append(h)
+                hash_prefixes.append(prefix)
+            self._hash_prefixes = hash_prefixes
+
+    def _build(self, config):
+        if isinstance(config, IntervalConfig):
+            text, offsets = self._text, self._offsets
+            return ''.join(text[offsets[start]:offsets[stop]] for start, stop in config.iter_runs())
+        if all(map(lt, config, islice(config, 1, None))):
+            return ''.join(self._runs(config))
         return ''.join(self._content[x] for x in config)
+
+    def _build_complement(self, config):
+        """
+        Build the test case of a complement by joining the test cases of the
+        remaining subsets. The test cases of the subsets are built only once
+        per split, i.e., while the complements refer to the same subsets list.
+
+        :param config: Complement configuration view.
+        :return: Test case described by the config.
+        """
+        subsets = config.subsets
+        with self._lock:
+            if self._split is not subsets:
+                self._split = subsets
+                self._split_tests = [None] * len(subsets)
+            split_tests = self._split_tests
+
+        tests = []
+        for i, subset in enumerate(subsets):
+            if i == config.removed:
+                continue
+            if split_tests[i] is None:
+                split_tests[i] = self._build(subset)
+            tests.append(split_tests[i])
+        return ''.join(tests)
+
+    def _runs(self, config):
+        """
+        Generate the contents of the maximal contiguous runs of an ordered
+        configuration by bisecting it until the first and last elements of the
+        pieces are consistent with their lengths.
+
+        :param config: Strictly increasing configuration.
+        :return: Generator of the contents of the runs, in order.
+        """
+        text, offsets = self._text, self._offsets
+        pieces = [(0, len(config))] if config else []
+        while pieces:
+            lo, hi = pieces.pop()
+            first, last = config[lo], config[hi - 1]
+            if last - first == hi - lo - 1:
+                yield text[offsets[first]:offsets[last + 1]]
+            else:
+                mid = (lo + hi) // 2
+                pieces.append((mid, hi))
+                pieces.append((lo, mid))
@@ -6,9 +6,18 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
+import asyncio
+import concurrent.futures
 import logging
 import math
+import os
+import psutil
 import pytest
+import random
+import subprocess
+import sys
+import threading
+import time
 
 import picire
 
@@ -56,6 +65,13 @@ class CaseTest:
         return picire.Outcome.FAIL if self.interesting([self.content[x] for x in config]) else picire.Outcome.PASS
 
 
+class AsyncCaseTest(CaseTest):
+
+    async def __call__(self, config, config_id):
+        await asyncio.sleep(0)
+        return super().__call__(config, config_id)
+
+
 @pytest.mark.parametrize('interesting, config, expect', [
     (interesting_a, config_a, expect_a),
     (interesting_b, config_b, expect_b),
@@ -67,17 +83,20 @@ class CaseTest:
 ])
 class TestApi:
 
-    def _run_picire(self, interesting, config, expect, granularity, dd, split, subset_first, subset_iterator, complement_iterator, cache):
+    def _run_picire(self, interesting, config, expect, granularity, dd, split, subset_first, subset_iterator, complement_iterator, cache, **dd_config):
         logging.basicConfig(format='%(message)s')
         logging.getLogger('picire').setLevel(logging.DEBUG)
 
         dd_obj = dd(CaseTest(interesting, config),
                     split=split(n=granularity),
                     cache=cache(),
-                    config_iterator=picire.iterator.CombinedIterator(subset_first, subset_iterator, complement_iterator))
-        output = [config[x] for x in dd_obj(list(range(len(config))))]
+                    config_iterator=picire.iterator.CombinedIterator(subset_first, subset_iterator, complement_iterator),
+                    **dd_config)
+        min_config = dd_obj(list(range(len(config))))
+        output = [config[x] for x in min_config]
 
         assert output == expect
+        assert min_config == [config.index(x) for x in expect]
 
     @pytest.mark.parametrize('split, subset_first, subset_iterator, complement_iterator, cache', [
         (picire.splitter.BalancedSplit, True, picire.iterator.forward, picire.iterator.forward, picire.cache.NoCache),
@@ -86,6 +105,7 @@ class TestApi:
         (picire.splitter.ZellerSplit, False, picire.iterator.backward, picire.iterator.backward, picire.cache.NoCache),
         (picire.splitter.BalancedSplit, True, picire.iterator.skip, picire.iterator.forward, picire.cache.ConfigCache),
         (picire.splitter.ZellerSplit, True, picire.iterator.skip, picire.iterator.backward, picire.cache.ConfigTupleCache),
+        (picire.splitter.BalancedSplit, False, picire.iterator.forward, picire.iterator.backward, picire.cache.BitsetCache),
     ])
     def test_dd(self, interesting, config, expect, granularity, split, subset_first, subset_iterator, complement_iterator, cache):
         self._run_picire(interesting, config, expect, granularity, picire.DD, split, subset_first, subset_iterator, complement_iterator, cache)
@@ -97,6 +117,899 @@ class TestApi:
         (picire.splitter.BalancedSplit, True, picire.iterator.backward, picire.iterator.backward, picire.cache.ConfigCache),
         (picire.splitter.ZellerSplit, False, picire.iterator.skip, picire.iterator.forward, picire.cache.ConfigTupleCache),
         (picire.splitter.BalancedSplit, False, picire.iterator.skip, picire.iterator.backward, picire.cache.NoCache),
+        (picire.splitter.ZellerSplit, True, picire.iterator.forward, picire.iterator.forward, picire.cache.BitsetCache),
     ])
     def test_parallel(self, interesting, config, expect, granularity, split, subset_first, subset_iterator, complement_iterator, cache):
         self._run_picire(interesting, config, expect, granularity, picire.ParallelDD, split, subset_first, subset_iterator, complement_iterator, cache)
+
+    @pytest.mark.parametrize('split, subset_first, subset_iterator, complement_iterator, cache', [
+        (picire.splitter.ZellerSplit, True, picire.iterator.forward, picire.iterator.forward, picire.cache.ConfigCache),
+        (picire.splitter.BalancedSplit, False, picire.iterator.backward, picire.iterator.forward, picire.cache.ConfigTupleCache),
+    ])
+    def test_parallel_speculate(self, interesting, config, expect, granularity, split, subset_first, subset_iterator, complement_iterator, cache):
+        self._run_picire(interesting, config, expect, granularity, picire.ParallelDD, split, subset_first, subset_iterator, complement_iterator, cache, speculate=True, proc_num=8)
+
+    @pytest.mark.parametrize('subset_first, subset_iterator, complement_iterator', [
+        (True, picire.iterator.forward, picire.iterator.forward),
+        (False, picire.iterator.backward, picire.iterator.forward),
+        (True, picire.iterator.skip, picire.iterator.backward),
+    ])
+    @pytest.mark.parametrize('speculate', [False, True])
+    def test_parallel_deterministic(self, interesting, config, expect, granularity, subset_first, subset_iterator, complement_iterator, speculate):
+        def run(dd, **dd_config):
+            tested = []
+
+            class RecordingTest(CaseTest):
+                def __call__(self, config, config_id):
+                    tested.append(list(config))
+                    return super().__call__(config, config_id)
+
+            dd_obj = dd(RecordingTest(interesting, config),
+                        split=picire.splitter.ZellerSplit(n=granularity),
+                        cache=picire.cache.ConfigTupleCache(),
+                        config_iterator=picire.iterator.CombinedIterator(subset_first, subset_iterator, complement_iterator),
+                        **dd_config)
+            return list(dd_obj(list(range(len(config))))), tested
+
+        expected, sequential_tests = run(picire.DD)
+        output, parallel_tests = run(picire.ParallelDD, deterministic=True, speculate=speculate, proc_num=4)
+        assert output == expected
+        assert all(test in parallel_tests for test in sequential_tests)
+
+    @pytest.mark.parametrize('policy', sorted(picire.PolicyRegistry.registry.keys()))
+    def test_parallel_policy(self, interesting, config, expect, granularity, policy):
+        self._run_picire(interesting, config, expect, granularity, picire.ParallelDD, picire.splitter.ZellerSplit, True, picire.iterator.forward, picire.iterator.backward, picire.cache.ConfigCache, policy=picire.PolicyRegistry.registry[policy](), proc_num=2)
+
+    @pytest.mark.parametrize('split, subset_first, subset_iterator, complement_iterator, cache', [
+        (picire.splitter.ZellerSplit, False, picire.iterator.forward, picire.iterator.backward, picire.cache.ConfigTupleCache),
+        (picire.splitter.BalancedSplit, True, picire.iterator.skip, picire.iterator.forward, picire.cache.ConfigCache),
+    ])
+    def test_parallel_process(self, interesting, config, expect, granularity, split, subset_first, subset_iterator, complement_iterator, cache):
+        self._run_picire(interesting, config, expect, granularity, picire.ParallelDD, split, subset_first, subset_iterator, complement_iterator, cache, executor='process', proc_num=2)
+
+
+    @pytest.mark.parametrize('split, subset_first, subset_iterator, complement_iterator, cache', [
+        (picire.splitter.ZellerSplit, True, picire.iterator.forward, picire.iterator.backward, picire.cache.ConfigTupleCache),
+        (picire.splitter.BalancedSplit, False, picire.iterator.skip, picire.iterator.forward, picire.cache.ConfigCache),
+    ])
+    @pytest.mark.parametrize('awaited', [False, True])
+    def test_parallel_async(self, interesting, config, expect, granularity, split, subset_first, subset_iterator, complement_iterator, cache, awaited):
+        dd_obj = picire.AsyncParallelDD(AsyncCaseTest(interesting, config),
+                                        split=split(n=granularity),
+                                        cache=cache(),
+                                        config_iterator=picire.iterator.CombinedIterator(subset_first, subset_iterator, complement_iterator),
+                                        proc_num=100)
+        config_ids = list(range(len(config)))
+        output = asyncio.run(dd_obj.reduce_async(config_ids)) if awaited else dd_obj(config_ids)
+        assert [config[x] for x in output] == expect
+
+
+@pytest.mark.parametrize('content', [
+    'abcdefgh',
+    ['a\n', 'bb\n', '\n', 'ccc\n', 'd\n', 'ee\n', 'f\n', 'gg'],
+])
+@pytest.mark.parametrize('config', [
+    [],
+    [3],
+    [0, 1, 2, 3, 4, 5, 6, 7],
+    [0, 1, 3, 4, 5, 7],
+    [7, 1, 0, 5],
+])
+def test_concat_test_builder(content, config):
+    test_builder = picire.ConcatTestBuilder(content)
+    expect = ''.join(content[x] for x in config)
+    assert test_builder(config) == expect
+    assert test_builder(config) == expect
+    assert test_builder.content_length(config) == len(expect)
+    assert test_builder.content_hash(config) == picire.ConcatTestBuilder(expect).content_hash(range(len(expect)))
+
+
+def test_content_hash_leading_nul():
+    test_builder = picire.ConcatTestBuilder(['\x00', '\x00', 'a'])
+    assert test_builder.content_hash([0, 2]) == test_builder.content_hash([1, 2])
+    assert test_builder.content_hash([0, 1, 2])[0] != test_builder.content_hash([1, 2])[0]
+    assert test_builder.content_hash([1, 2])[0] != test_builder.content_hash([2])[0]
+
+    cache_obj = picire.cache.ContentHashCache()
+    cache_obj.set_test_builder(test_builder)
+    cache_obj.add(picire.IntervalConfig([2]), picire.Outcome.PASS)
+    assert cache_obj.lookup(picire.IntervalConfig([1, 2])) is None
+
+
+@pytest.mark.parametrize('config', [
+    [],
+    [3],
+    [0, 1, 2, 3, 4, 5, 6, 7],
+    [0, 1, 3, 4, 5, 7],
+    [7, 1, 0, 5],
+])
+def test_interval_config(config):
+    interval_config = picire.IntervalConfig(config)
+    assert list(interval_config) == config
+    assert len(interval_config) == len(config)
+    assert interval_config == picire.IntervalConfig.from_runs(interval_config.runs)
+    assert interval_config == config and config == interval_config
+    assert interval_config != config + [8]
+    for start in range(-len(config) - 1, len(config) + 1):
+        for stop in range(-len(config) - 1, len(config) + 1):
+            assert list(interval_config[start:stop]) == config[start:stop]
+    assert list(picire.IntervalConfig.concat([interval_config[:2], interval_config[2:]])) == config
+
+
+@pytest.mark.parametrize('split', [
+    picire.splitter.ZellerSplit,
+    picire.splitter.BalancedSplit,
+])
+@pytest.mark.parametrize('config', [
+    [0, 1, 2, 4, 5, 7, 8, 9, 10, 11, 13, 15, 16],
+    list(range(17)),
+])
+def test_complement_config(split, config):
+    content = 'abcdefghijklmnopq'
+    test_builder = picire.ConcatTestBuilder(content)
+    subsets = split(n=4)([picire.IntervalConfig(config)])
+    split_index = picire.config._SplitIndex(subsets)
+    for i in range(len(subsets)):
+        complement = picire.ComplementConfig(subsets, i, split_index=split_index)
+        expect = [c for si, s in enumerate(subsets) for c in s if si != i]
+        assert list(complement) == expect
+        assert len(complement) == len(expect)
+        assert list(complement.iter_runs()) == list(picire.IntervalConfig(expect).runs)
+        assert complement == picire.IntervalConfig(expect)
+        assert complement == expect
+        assert hash(complement) == hash(picire.IntervalConfig(expect))
+        assert test_builder(complement) == ''.join(content[x] for x in expect)
+
+
+@pytest.mark.parametrize('cache', [
+    picire.cache.ContentCache,
+    picire.cache.ContentHashCache,
+])
+def test_content_cache_tiers(cache):
+    class CountingTestBuilder:
+        def __init__(self, content):
+            self.test_builder = picire.ConcatTestBuilder(content, memo_size=0)
+            self.builds = 0
+
+        def __call__(self, config):
+            self.builds += 1
+            return self.test_builder(config)
+
+    test_builder = CountingTestBuilder('abcabc')
+    cache_obj = cache()
+    cache_obj.set_test_builder(test_builder)
+
+    cache_obj.add(picire.IntervalConfig([0, 1, 2]), picire.Outcome.PASS)
+    builds = test_builder.builds
+    assert cache_obj.lookup(picire.IntervalConfig([0, 1, 2])) is picire.Outcome.PASS
+    assert test_builder.builds == builds
+    assert cache_obj.lookup(picire.IntervalConfig([3, 4, 5])) is picire.Outcome.PASS
+    assert test_builder.builds == builds + 1
+    assert cache_obj.lookup(picire.IntervalConfig([3, 4, 5])) is picire.Outcome.PASS
+    assert test_builder.builds == builds + 1
+
+
+@pytest.mark.parametrize('cache, warm', [
+    (picire.cache.ConfigCache, False),
+    (picire.cache.ConfigTupleCache, False),
+    (picire.cache.BitsetCache, False),
+    (picire.cache.ContentCache, True),
+    (picire.cache.ContentHashCache, True),
+])
+def test_cache_atom_change(cache, warm):
+    cache_obj = cache()
+    cache_obj.set_test_builder(picire.ConcatTestBuilder(['ab\n', 'cd\n', 'ef\n']))
+    cache_obj.rebase(picire.IntervalConfig(range(3)))
+    cache_obj.add(picire.IntervalConfig([0, 2]), picire.Outcome.PASS)
+
+    # Switching from lines to characters keeps content-keyed entries only.
+    cache_obj.set_test_builder(picire.ConcatTestBuilder('ab\ncd\nef\n'))
+    cache_obj.rebase(picire.IntervalConfig(range(9)))
+    assert cache_obj.lookup(picire.IntervalConfig([0, 2])) is None
+    assert cache_obj.lookup(picire.IntervalConfig([0, 1, 2, 6, 7, 8])) is (picire.Outcome.PASS if warm else None)
+
+
+def test_persistent_cache(tmpdir):
+    path = os.path.join(str(tmpdir), 'cache.sqlite')
+    test_builder = picire.ConcatTestBuilder('abcabc')
+
+    cache_a = picire.cache.PersistentCache(path=path, namespace='a')
+    cache_a.set_test_builder(test_builder)
+    cache_a.add(picire.IntervalConfig([0, 1, 2]), picire.Outcome.PASS)
+
+    cache_b = picire.cache.PersistentCache(path=path, namespace='a')
+    cache_b.set_test_builder(test_builder)
+    assert cache_b.lookup(picire.IntervalConfig([3, 4, 5])) is picire.Outcome.PASS
+    assert cache_b.lookup(picire.IntervalConfig([0, 1])) is None
+
+    cache_c = picire.cache.PersistentCache(path=path, namespace='c')
+    cache_c.set_test_builder(test_builder)
+    assert cache_c.lookup(picire.IntervalConfig([0, 1, 2])) is None
+
+
+@pytest.mark.parametrize('cache', [
+    picire.cache.ConfigCache,
+    picire.cache.ConfigTupleCache,
+])
+@pytest.mark.parametrize('policy', picire.BoundedCache.policies)
+def test_bounded_cache(cache, policy):
+    configs = [picire.IntervalConfig(range(i, 2 * i)) for i in range(1, 21)]
+    cache_obj = picire.BoundedCache(cache_class=cache, memory_limit=5 * cache().entry_size(configs[0]), policy=policy)
+    for config in configs:
+        cache_obj.add(config, picire.Outcome.PASS)
+        assert cache_obj.lookup(config) is picire.Outcome.PASS
+        assert cache_obj.lookup(configs[0]) in (picire.Outcome.PASS, None)
+    assert 0 < cache_obj.get_evictions() < len(configs)
+    assert cache_obj.lookup(configs[-1]) is picire.Outcome.PASS
+    assert sum(1 for config in configs if cache_obj.lookup(config) is not None) == len(configs) - cache_obj.get_evictions()
+    if policy == 'lru':
+        assert cache_obj.lookup(configs[0]) is picire.Outcome.PASS
+    if policy == 'oldest':
+        assert cache_obj.lookup(configs[0]) is None
+
+
+@pytest.mark.parametrize('cache', [
+    picire.cache.ContentCache,
+    picire.cache.ContentHashCache,
+])
+def test_bounded_cache_atom_change(cache):
+    lines = [f'line {i}\n' for i in range(40)]
+    probe = cache()
+    probe.set_test_builder(picire.ConcatTestBuilder(lines))
+    limit = 5 * probe.entry_size(picire.IntervalConfig(range(10, 20)))
+    cache_obj = picire.BoundedCache(cache_class=cache, memory_limit=limit, measure_memory=True)
+    # The limit holds across the phases of reducing lines and then characters.
+    for content in (lines, list(''.join(lines))):
+        cache_obj.set_test_builder(picire.ConcatTestBuilder(content))
+        for i in range(1, 20):
+            cache_obj.add(picire.IntervalConfig(range(i, 2 * i)), picire.Outcome.PASS)
+            assert cache_obj.get_size()[0] <= limit
+    assert cache_obj.lookup(picire.IntervalConfig(range(19, 38))) is picire.Outcome.PASS
+
+
+def test_bitset_cache():
+    cache_obj = picire.cache.BitsetCache(cache_fail=True)
+    cache_obj.add(picire.IntervalConfig([1, 2]), picire.Outcome.PASS)
+    assert cache_obj.lookup(picire.IntervalConfig([1, 2])) is None
+
+    cache_obj.rebase(picire.IntervalConfig(range(10)))
+    cache_obj.add(picire.IntervalConfig([1, 2, 5]), picire.Outcome.PASS)
+    cache_obj.add(picire.IntervalConfig([0, 7, 8]), picire.Outcome.FAIL)
+    cache_obj.add(picire.IntervalConfig([2, 3, 4, 5, 6, 7, 8]), picire.Outcome.PASS)
+    cache_obj.add(picire.IntervalConfig([3, 11]), picire.Outcome.PASS)
+    assert cache_obj.lookup(picire.IntervalConfig([1, 2, 5])) is picire.Outcome.PASS
+    assert cache_obj.lookup(picire.IntervalConfig([0, 7, 8])) is picire.Outcome.FAIL
+    assert cache_obj.lookup(picire.IntervalConfig([1, 2])) is None
+    assert cache_obj.lookup(picire.IntervalConfig([3, 11])) is None
+
+    new_base = picire.IntervalConfig([1, 2, 3, 4, 5, 6, 7, 8])
+    cache_obj.clean(new_base)
+    cache_obj.rebase(new_base)
+    assert cache_obj.lookup(picire.IntervalConfig([1, 2, 5])) is picire.Outcome.PASS
+    assert cache_obj.lookup(picire.IntervalConfig([2, 3, 4, 5, 6, 7, 8])) is picire.Outcome.PASS
+    assert cache_obj.lookup(picire.IntervalConfig([0, 7, 8])) is None
+    cache_obj.add(picire.IntervalConfig([4, 8]), picire.Outcome.PASS)
+
+    cache_obj.rebase(picire.IntervalConfig([2, 4, 5, 8]))
+    assert cache_obj.lookup(picire.IntervalConfig([4, 8])) is picire.Outcome.PASS
+    assert cache_obj.lookup(picire.IntervalConfig([2, 5])) is None
+    assert cache_obj.lookup(picire.IntervalConfig([1, 2, 5])) is None
+
+
+def test_bitset_cache_deferred_rebase():
+    cache_obj = picire.cache.BitsetCache(measure_memory=True)
+    cache_obj.rebase(picire.IntervalConfig(range(10)))
+    cache_obj.add(picire.IntervalConfig([0, 1]), picire.Outcome.PASS)
+
+    # Re-packing is deferred, but the dropped atoms are outside of the base.
+    cache_obj.rebase(picire.IntervalConfig(range(1, 10)))
+    assert cache_obj.lookup(picire.IntervalConfig([0, 1])) is None
+    assert cache_obj.get_size()[1] == 1
+
+    # Entries that are not subsets of the base can still be evicted.
+    cache_obj.evict(picire.IntervalConfig([0, 1]))
+    assert cache_obj.get_size()[1] == 0
+
+
+def test_monotone_cache():
+    cache_obj = picire.cache.MonotoneCache(cache_fail=True)
+    cache_obj.rebase(picire.IntervalConfig(range(10)))
+    cache_obj.add(picire.IntervalConfig([1, 2, 3, 5]), picire.Outcome.PASS)
+    cache_obj.add(picire.IntervalConfig([1, 2]), picire.Outcome.PASS)
+    cache_obj.add(picire.IntervalConfig([0, 8]), picire.Outcome.FAIL)
+    assert cache_obj.lookup(picire.IntervalConfig([2, 5])) is picire.Outcome.PASS
+    assert cache_obj.lookup(picire.IntervalConfig([0, 4, 8])) is picire.Outcome.FAIL
+    assert cache_obj.lookup(picire.IntervalConfig([2, 4])) is None
+
+    # The intersection of passing configurations with the new base still passes.
+    cache_obj.rebase(picire.IntervalConfig([0, 2, 4, 5, 8]))
+    assert cache_obj.lookup(picire.IntervalConfig([2, 5])) is picire.Outcome.PASS
+    assert cache_obj.lookup(picire.IntervalConfig([0, 2, 8])) is picire.Outcome.FAIL
+    assert cache_obj.lookup(picire.IntervalConfig([2, 4])) is None
+
+
+def test_monotone_cache_index():
+    # Failing iff the configuration contains 3, 17, and 25 (i.e., monotone).
+    def outcome(config):
+        return picire.Outcome.FAIL if {3, 17, 25} <= set(config) else picire.Outcome.PASS
+
+    rnd = random.Random(0)
+    cache_obj = picire.cache.MonotoneCache(cache_fail=True)
+    cache_obj.rebase(picire.IntervalConfig(range(40)))
+    added = []
+    for _ in range(300):
+        config = sorted(rnd.sample(range(40), rnd.choice([2, 5, 20, 35, 38])))
+        expect = None
+        if any(set(config) <= set(c) for c, r in added if r is picire.Outcome.PASS):
+            expect = picire.Outcome.PASS
+        elif any(set(c) <= set(config) for c, r in added if r is picire.Outcome.FAIL):
+            expect = picire.Outcome.FAIL
+        assert cache_obj.lookup(picire.IntervalConfig(config)) is expect
+        if expect is None:
+            cache_obj.add(picire.IntervalConfig(config), outcome(config))
+            added.append((config, outcome(config)))
+
+
+@pytest.mark.parametrize('interesting, config, expect', [
+    (interesting_b, config_b, expect_b),
+    (interesting_c, config_c, expect_c),
+])
+def test_monotone_dd(interesting, config, expect):
+    class CountingTest(CaseTest):
+        count = 0
+
+        def __call__(self, config, config_id):
+            self.count += 1
+            return super().__call__(config, config_id)
+
+    tests = {}
+    for cache in (picire.cache.ConfigTupleCache, picire.cache.MonotoneCache):
+        test = CountingTest(interesting, config)
+        output = [config[x] for x in picire.DD(test, split=picire.splitter.ZellerSplit(n=2), cache=cache())(list(range(len(config))))]
+        assert output == expect
+        tests[cache] = test.count
+    assert tests[picire.cache.MonotoneCache] < tests[picire.cache.ConfigTupleCache]
+
+
+@pytest.mark.parametrize('cache', [
+    picire.cache.ConfigCache,
+    picire.cache.ConfigTupleCache,
+    picire.cache.ContentCache,
+    picire.cache.ContentHashCache,
+])
+def test_cache_clean(cache):
+    cache_obj = picire.BoundedCache(cache_class=cache, memory_limit=1 << 30, policy='lru')
+    cache_obj.set_test_builder(picire.ConcatTestBuilder([f'{i}\n' for i in range(40)]))
+    configs = [picire.IntervalConfig(range(i, 40 - i)) for i in range(20)]
+    for config in configs:
+        cache_obj.add(config, picire.Outcome.PASS)
+    cache_obj.evict(configs[15])
+    cache_obj.clean(configs[10])
+    assert [cache_obj.lookup(config) for config in configs] == [None] * 10 + [picire.Outcome.PASS] * 5 + [None] + [picire.Outcome.PASS] * 4
+
+    cache_obj.add(configs[0], picire.Outcome.PASS)
+    cache_obj.clean(configs[12])
+    assert cache_obj.lookup(configs[0]) is None
+    assert cache_obj.lookup(configs[12]) is picire.Outcome.PASS
+
+
+@pytest.mark.parametrize('cache', [
+    picire.cache.ConfigCache,
+    picire.cache.ConfigTupleCache,
+    picire.cache.ContentCache,
+    picire.cache.ContentHashCache,
+])
+def test_cache_size_accounting(cache):
+    cache_obj = cache(cache_fail=True, measure_memory=True)
+    cache_obj.set_test_builder(picire.ConcatTestBuilder([f'{i}\n' for i in range(40)]))
+    configs = [picire.IntervalConfig(range(i, 40 - i)) for i in range(10)] + [picire.IntervalConfig(range(0, 40, 2))]
+    for config in configs:
+        cache_obj.add(config, picire.Outcome.PASS)
+    _, full_count = cache_obj.get_size()
+    assert full_count >= len(configs)
+
+    cache_obj.clean(configs[5])
+    cache_obj.evict(configs[7])
+    _, count = cache_obj.get_size()
+    assert count < full_count
+
+    # The running estimate is replaced by the measured size on calibration.
+    cache_obj.calibration_interval = 1
+    size, _ = cache_obj.get_size()
+    assert size > 0
+    assert cache_obj.get_size()[0] == size
+
+    assert picire.cache.NoCache().get_size() == (0, 0)
+
+
+def test_parallel_cancel():
+    class SlowPassTest(CaseTest):
+        def __init__(self, interesting, content):
+            super().__init__(interesting, content)
+            self.lock = threading.Lock()
+            self.events = {}
+            self.cancelled = []
+
+        def _event(self, config_id):
+            with self.lock:
+                return self.events.setdefault(config_id, threading.Event())
+
+        def __call__(self, config, config_id):
+            outcome = super().__call__(config, config_id)
+            # Passing tests are slow, unless they get cancelled.
+            if outcome is picire.Outcome.PASS and self._event(config_id).wait(timeout=0.2):
+                return picire.Outcome.UNKNOWN
+            return outcome
+
+        def cancel(self, config_id):
+            self.cancelled.append(config_id)
+            self._event(config_id).set()
+
+    class OutcomeRecorder(picire.events.Statistics):
+        def __init__(self):
+            super().__init__()
+            self.outcomes = {}
+
+        def test_finished(self, outcome, **kwargs):
+            super().test_finished(outcome=outcome, **kwargs)
+            self.outcomes.setdefault(kwargs['configuration_id'], []).append((tuple(kwargs['configuration']), outcome))
+
+    class RecordingCache(picire.cache.ConfigTupleCache):
+        def __init__(self):
+            super().__init__()
+            self.added = []
+
+        def add(self, config, result):
+            self.added.append((tuple(config), result))
+            super().add(config, result)
+
+    test = SlowPassTest(interesting_a, config_a)
+    stats = OutcomeRecorder()
+    observer = picire.events.EventListener()
+    observer.subscribe(stats)
+    cache = RecordingCache()
+    dd_obj = picire.ParallelDD(test, split=picire.splitter.ZellerSplit(n=8), cache=cache, proc_num=4,
+                               config_iterator=picire.iterator.CombinedIterator(False, picire.iterator.forward, picire.iterator.forward),
+                               observer=observer)
+    assert [config_a[x] for x in dd_obj(list(range(len(config_a))))] == expect_a
+    assert test.cancelled
+
+    # Every test is reported once, and some of them are cancelled.
+    assert all(len(outcomes) == 1 for outcomes in stats.outcomes.values())
+    cancelled = [config_id for config_id, [(_, outcome)] in stats.outcomes.items() if outcome is picire.Outcome.UNKNOWN]
+    assert cancelled
+    assert int(stats.tests_cancelled) == len(cancelled)
+    assert set(cancelled) <= {' / '.join(config_id) for config_id in test.cancelled}
+
+    # Only the outcomes of the tests that were not cancelled are cached.
+    decided = {(config, outcome) for [(config, outcome)] in stats.outcomes.values() if outcome is not picire.Outcome.UNKNOWN}
+    assert cache.added
+    assert set(cache.added) <= decided
+
+
+@pytest.mark.parametrize('dd, speculate', [
+    (picire.ParallelDD, False),
+    (picire.ParallelDD, True),
+    (picire.AsyncParallelDD, True),
+])
+def test_parallel_max_tests(dd, speculate):
+    class CountingTest(CaseTest):
+        def __init__(self, interesting, content):
+            super().__init__(interesting, content)
+            self.lock = threading.Lock()
+            self.tests = 0
+
+        def __call__(self, config, config_id):
+            if config_id[-1] != 'assert':
+                with self.lock:
+                    self.tests += 1
+            return super().__call__(config, config_id)
+
+    class AsyncCountingTest(CountingTest):
+        async def __call__(self, config, config_id):
+            return super().__call__(config, config_id)
+
+    test = (AsyncCountingTest if dd is picire.AsyncParallelDD else CountingTest)(interesting_b, config_b)
+    dd_obj = dd(test, split=picire.splitter.ZellerSplit(n=8), cache=picire.cache.ConfigTupleCache(), proc_num=4, speculate=speculate,
+                stop=picire.LimitReduction(max_tests=3))
+    with pytest.raises(picire.ReductionStopped) as exc_info:
+        dd_obj(list(range(len(config_b))))
+    # Tests queued but not started when the limit is reached are not counted.
+    assert test.tests == 3
+    assert exc_info.value.result == list(range(len(config_b)))
+
+
+@pytest.mark.parametrize('speculate', [False, True])
+def test_parallel_deadline(speculate):
+    class SlowTest(CaseTest):
+        def __init__(self, interesting, content):
+            super().__init__(interesting, content)
+            self.starts = []
+
+        def __call__(self, config, config_id):
+            self.starts.append(time.time())
+            time.sleep(0.1)
+            return super().__call__(config, config_id)
+
+    test = SlowTest(interesting_b, config_b)
+    deadline = time.time() + 0.3
+    dd_obj = picire.ParallelDD(test, split=picire.splitter.ZellerSplit(n=8), cache=picire.cache.ConfigTupleCache(), proc_num=2, speculate=speculate,
+                               stop=picire.LimitReduction(deadline=deadline))
+    with pytest.raises(picire.ReductionStopped):
+        dd_obj(list(range(len(config_b))))
+    # The tests queued before the deadline do not start after it.
+    assert not [start for start in test.starts if start > deadline + 0.05]
+
+
+def interesting_merge(c):
+    # Removing 1 or 3 alone keeps the config failing, but removing both does not.
+    return 5 in c and 8 in c and (1 in c or 3 in c)
+
+
+@pytest.mark.parametrize('interesting, expect', [
+    (interesting_a, [2, 5, 8]),
+    (interesting_merge, [2, 3, 5, 8]),
+])
+def test_parallel_greedy_merge(interesting, expect):
+    dd_obj = picire.ParallelDD(CaseTest(interesting, config_a), cache=picire.cache.ConfigTupleCache(), proc_num=4, greeddy=True)
+    subsets = [picire.IntervalConfig([x]) for x in range(len(config_a))]
+    # Removing any of 1, 3, 4, 6, or 7 alone keeps the config failing.
+    subsets, complement_offset = dd_obj._greedy_search(0, subsets, [-1, -3, -4, -6, -7], 0)
+    dd_obj._scheduler.shutdown()
+    assert [config_a[x] for x in picire.IntervalConfig.concat(subsets)] == expect
+    assert complement_offset == 0
+
+
+def test_adaptive_concurrency():
+    class ScriptedConcurrency(picire.AdaptiveConcurrency):
+        def __init__(self, samples, **kwargs):
+            super().__init__(os.cpu_count() + 4, interval=0, memory_reserve=1000, **kwargs)
+            self.samples = iter(samples)
+
+        def _sample(self, running):
+            return next(self.samples)
+
+    cores = os.cpu_count()
+    concurrency = ScriptedConcurrency([(10.0, 5000, 100)] * 5 +  # Idle resources: raise up to the maximum.
+                                      [(10.0, 700, 100)] +  # 300 bytes of memory missing: lower by 3 tests.
+                                      [(99.0, 5000, 100)] * 2,  # CPU saturated: lower while more tests run than cores.
+                                      jobs=cores)
+    decisions = [concurrency.adjust(running=concurrency.jobs, waiting=10) for _ in range(8)]
+    assert [d and (d['previous'], d['jobs'], d['reason']) for d in decisions] == [
+        (cores, cores + 1, 'idle'),
+        (cores + 1, cores + 2, 'idle'),
+        (cores + 2, cores + 3, 'idle'),
+        (cores + 3, cores + 4, 'idle'),
+        None,
+        (cores + 4, cores + 1, 'memory'),
+        (cores + 1, cores, 'cpu'),
+        None,
+    ]
+
+
+def test_parallel_adaptive_concurrency():
+    class DecisionRecorder(picire.events.Statistics):
+        def __init__(self):
+            super().__init__()
+            self.decisions = []
+
+        def concurrency_changed(self, jobs, previous, **kwargs):
+            super().concurrency_changed(jobs, previous, **kwargs)
+            self.decisions.append((previous, jobs, kwargs['reason']))
+
+    stats = DecisionRecorder()
+    observer = picire.events.EventListener()
+    observer.subscribe(stats)
+    # More memory to keep available than the physical memory: the number of
+    # parallel tests must be lowered to the minimum.
+    concurrency = picire.AdaptiveConcurrency(4, jobs=4, min_jobs=2, interval=0, memory_reserve=2 * psutil.virtual_memory().total)
+    dd_obj = picire.ParallelDD(CaseTest(interesting_a, config_a), split=picire.splitter.ZellerSplit(n=8), cache=picire.cache.ConfigTupleCache(), proc_num=4,
+                               concurrency=concurrency, observer=observer)
+    assert [config_a[x] for x in dd_obj(list(range(len(config_a))))] == expect_a
+    assert stats.decisions and all(jobs < previous and reason == 'memory' for previous, jobs, reason in stats.decisions)
+    assert int(stats.concurrency_changes) == len(stats.decisions)
+    assert (stats.jobs_min, stats.jobs_max) == (2, 4)
+    assert concurrency.jobs == 2
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+def test_adaptive_concurrency_test_memory(tmpdir):
+    concurrency = picire.AdaptiveConcurrency(2, interval=0, memory_reserve=0)
+    # Child processes that do not run test commands are not measured.
+    other = subprocess.Popen(['sleep', '30'])
+    try:
+        assert concurrency._sample(running=1)[2] == 0
+
+        test = picire.SubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'sleep 30 & wait'],
+                                     work_dir=str(tmpdir), filename='test.txt')
+        thread = threading.Thread(target=test, args=(picire.IntervalConfig([0, 1]), ('t0',)))
+        thread.start()
+        try:
+            # The test command is measured once it has been started.
+            deadline = time.time() + 10
+            while concurrency._sample(running=1)[2] == 0 and time.time() < deadline:
+                time.sleep(0.05)
+            assert concurrency._sample(running=1)[2] > 0
+        finally:
+            test.cancel(('t0',))
+            thread.join()
+    finally:
+        other.kill()
+        other.wait()
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+def test_subprocess_cancel(tmpdir):
+    test = picire.SubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'sleep 30 & wait'],
+                                 work_dir=str(tmpdir), filename='test.txt')
+    threading.Timer(0.5, test.cancel, args=[('t0',)]).start()
+    start = time.time()
+    assert test(picire.IntervalConfig([0, 1]), ('t0',)) is picire.Outcome.UNKNOWN
+    assert time.time() - start < 10
+
+    test.cancel(('t1',))
+    assert test(picire.IntervalConfig([0, 1]), ('t1',)) is picire.Outcome.UNKNOWN
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+def test_async_subprocess_cancel(tmpdir):
+    test = picire.AsyncSubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'sleep 30 & wait'],
+                                      work_dir=str(tmpdir), filename='test.txt')
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.5, test.cancel, ('t0',))
+        assert await test(picire.IntervalConfig([0, 1]), ('t0',)) is picire.Outcome.UNKNOWN
+
+        task = asyncio.ensure_future(test(picire.IntervalConfig([0, 1]), ('t1',)))
+        loop.call_later(0.5, task.cancel)
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.time()
+    asyncio.run(run())
+    assert time.time() - start < 10
+    test.close()
+    assert not os.listdir(str(tmpdir))
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+def test_async_subprocess_off_loop(tmpdir):
+    class ThreadRecordingTest(picire.AsyncSubprocessTest):
+        threads = set()
+
+        def _prepare(self, config, config_id):
+            self.threads.add(threading.current_thread())
+            return super()._prepare(config, config_id)
+
+        def _finish(self, config_id, run, returncode, timed_out=False):
+            self.threads.add(threading.current_thread())
+            return super()._finish(config_id, run, returncode, timed_out)
+
+    test = ThreadRecordingTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'grep -q a "$0"', '%s'],
+                               work_dir=str(tmpdir), filename='test.txt')
+
+    async def run():
+        return await test(picire.IntervalConfig([0, 1]), ('t0',))
+
+    assert asyncio.run(run()) is picire.Outcome.FAIL
+    test.close()
+    # The file system work does not block the event loop.
+    assert test.threads and threading.current_thread() not in test.threads
+    assert not os.listdir(str(tmpdir))
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+@pytest.mark.parametrize('cleanup', [True, False])
+def test_subprocess_reuse_dirs(tmpdir, cleanup):
+    work_dir, scratch_dir = str(tmpdir.join('tests')), str(tmpdir.join('scratch'))
+    # Fails if the test case contains 'a', and leaves a file behind if it contains 'b'.
+    test = picire.SubprocessTest(test_builder=picire.ConcatTestBuilder('abc'),
+                                 command_pattern=['sh', '-c', 'if grep -q b "$0"; then touch out; fi; grep -q a "$0"', '%s'],
+                                 work_dir=work_dir, filename='test.txt', cleanup=cleanup, reuse_dirs=True, scratch_dir=scratch_dir)
+    configs = [[0], [1], [0, 1], [2], [0, 2]]
+    outcomes = [test(picire.IntervalConfig(config), ('r0', f't{i}')) for i, config in enumerate(configs)]
+    assert outcomes == [picire.Outcome.FAIL, picire.Outcome.PASS, picire.Outcome.FAIL, picire.Outcome.PASS, picire.Outcome.FAIL]
+
+    test.close()
+    assert os.listdir(scratch_dir) == []
+    if cleanup:
+        assert not os.path.exists(work_dir)
+    else:
+        assert sorted(os.listdir(work_dir)) == [f'r0_t{i}' for i in range(len(configs))]
+        assert os.path.exists(os.path.join(work_dir, 'r0_t1', 'out'))
+        with open(os.path.join(work_dir, 'r0_t2', 'test.txt')) as f:
+            assert f.read() == 'ab'
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+@pytest.mark.parametrize('delivery', [
+    'stdin',
+    pytest.param('memfd', marks=pytest.mark.skipif(not hasattr(os, 'memfd_create'), reason='requires memfd_create')),
+])
+@pytest.mark.parametrize('cleanup', [True, False])
+def test_subprocess_delivery(tmpdir, delivery, cleanup):
+    work_dir = str(tmpdir.join('tests'))
+    test = picire.SubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'grep -q a "$0"', '%s'],
+                                 work_dir=work_dir, filename='test.txt', cleanup=cleanup, delivery=delivery)
+    assert test(picire.IntervalConfig([0, 1]), ('t0',)) is picire.Outcome.FAIL
+    assert test(picire.IntervalConfig([1, 2]), ('t1',)) is picire.Outcome.PASS
+    assert asyncio.run(picire.AsyncSubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'grep -q a "$0"', '%s'],
+                                                  work_dir=work_dir, filename='test.txt', delivery=delivery)(picire.IntervalConfig([0]), ('t2',))) is picire.Outcome.FAIL
+
+    test.close()
+    if cleanup:
+        assert os.listdir(work_dir) == []
+    else:
+        with open(os.path.join(work_dir, 't0', 'test.txt')) as f:
+            assert f.read() == 'ab'
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+def test_subprocess_timeout(tmpdir):
+    test = picire.SubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'sleep 30 & wait'],
+                                 work_dir=str(tmpdir), filename='test.txt', timeout=0.5)
+    start = time.time()
+    assert test(picire.IntervalConfig([0, 1]), ('t0',)) is picire.Outcome.TIMEOUT
+    assert asyncio.run(picire.AsyncSubprocessTest(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=['sh', '-c', 'sleep 30 & wait'],
+                                                  work_dir=str(tmpdir), filename='test.txt', timeout=0.5)(picire.IntervalConfig([0]), ('t1',))) is picire.Outcome.TIMEOUT
+    assert time.time() - start < 10
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX shell')
+@pytest.mark.parametrize('tester', [picire.SubprocessTest, picire.AsyncSubprocessTest])
+def test_subprocess_resource_limits(tmpdir, tester):
+    def run(command_pattern, **kwargs):
+        test = tester(test_builder=picire.ConcatTestBuilder('abc'), command_pattern=command_pattern,
+                      work_dir=str(tmpdir), filename='test.txt', timeout=30, **kwargs)
+        outcome = test(picire.IntervalConfig([0, 1]), ('t0',))
+        return asyncio.run(outcome) if asyncio.iscoroutine(outcome) else outcome
+
+    # The limits are in effect as soon as the test command starts.
+    assert run([sys.executable, '-c', 'import resource, sys; sys.exit(resource.getrlimit(resource.RLIMIT_CPU) != (1, 2))'], cpu_limit=1) is picire.Outcome.FAIL
+    # A test command killed for exceeding its CPU time limit is not interesting.
+    assert run(['sh', '-c', 'while :; do :; done'], cpu_limit=1) is picire.Outcome.PASS
+    # Neither is one whose allocation fails due to its memory limit.
+    assert run([sys.executable, '-c', 'bytearray(1 << 30)'], memory_limit=1 << 28) is picire.Outcome.PASS
+    assert run([sys.executable, '-c', 'bytearray(1 << 20)'], memory_limit=1 << 28) is picire.Outcome.FAIL
+
+
+class TimeoutCaseTest(CaseTest):
+
+    def __call__(self, config, config_id):
+        # The test of the configurations that contain 1 but not 5 hangs.
+        if 1 in [self.content[x] for x in config] and 5 not in [self.content[x] for x in config]:
+            return picire.Outcome.TIMEOUT
+        return super().__call__(config, config_id)
+
+
+@pytest.mark.parametrize('dd, dd_config', [
+    (picire.DD, {}),
+    (picire.ParallelDD, {'proc_num': 4}),
+])
+@pytest.mark.parametrize('timeout_outcome, expect', [
+    (picire.Outcome.TIMEOUT, expect_a),
+    (picire.Outcome.PASS, expect_a),
+    (picire.Outcome.FAIL, [1]),
+])
+def test_timeout_outcome(dd, dd_config, timeout_outcome, expect):
+    stats = picire.events.Statistics()
+    observer = picire.events.EventListener()
+    observer.subscribe(stats)
+    dd_obj = dd(TimeoutCaseTest(interesting_a, config_a), split=picire.splitter.ZellerSplit(n=2), cache=picire.cache.ConfigTupleCache(),
+                timeout_outcome=timeout_outcome, observer=observer, **dd_config)
+    assert [config_a[x] for x in dd_obj(list(range(len(config_a))))] == expect
+    assert int(stats.tests_timed_out) > 0
+
+
+_test_server = """
+import os, struct, sys, time
+with open(sys.argv[1], 'a') as f:
+    f.write(f'{os.getpid()}\\n')
+while True:
+    header = sys.stdin.buffer.read(4)
+    if len(header) < 4:
+        break
+    content = sys.stdin.buffer.read(struct.unpack('>I', header)[0]).decode()
+    if 'x' in content:
+        sys.exit(1)
+    if 'h' in content:
+        time.sleep(30)
+    if 'd' in content:
+        sys.stdout.buffer.write(b'debug: hello\\n')
+    response = b'FAIL' if '5' in content and '8' in content and not ('7' in content and '2' not in content) else b'PASS'
+    sys.stdout.buffer.write(struct.pack('>I', len(response)) + response)
+    sys.stdout.buffer.flush()
+"""
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason='requires POSIX pipes')
+def test_server_test(tmpdir):
+    server, starts = str(tmpdir.join('server.py')), str(tmpdir.join('starts.txt'))
+    with open(server, 'w') as f:
+        f.write(_test_server)
+    content = config_a + ['x', 'h', 'd']
+    test = picire.ServerTest(test_builder=picire.ConcatTestBuilder([str(c) for c in content]), command=[sys.executable, server, starts], timeout=1)
+
+    # Servers are reused.
+    assert test(picire.IntervalConfig([4, 7]), ('t0',)) is picire.Outcome.FAIL
+    assert test(picire.IntervalConfig([0]), ('t1',)) is picire.Outcome.PASS
+    assert test.starts == 1
+
+    # Crashing and hanging servers are restarted, and the test is retried. If
+    # the retries are exhausted, a hanging server yields TIMEOUT, while a
+    # broken one is an error.
+    with pytest.raises(RuntimeError):
+        test(picire.IntervalConfig([4, 7, 8]), ('t2',))
+    assert test(picire.IntervalConfig([9]), ('t3',)) is picire.Outcome.TIMEOUT
+    assert test.starts == 4
+    assert test(picire.IntervalConfig([4, 7]), ('t4',)) is picire.Outcome.FAIL
+    assert test.starts == 5
+
+    test.timeout = None
+
+    # Output that is not a response is detected even without a timeout
+    # (instead of waiting for as many bytes as the output encodes). If it is
+    # not, the cancellation unblocks the test, which then returns UNKNOWN.
+    timer = threading.Timer(10, test.cancel, args=[('t6',)])
+    timer.start()
+    with pytest.raises(RuntimeError, match='invalid response header'):
+        test(picire.IntervalConfig([4, 7, 10]), ('t6',))
+    timer.cancel()
+    assert test.starts == 6
+
+    threading.Timer(0.5, test.cancel, args=[('t5',)]).start()
+    assert test(picire.IntervalConfig([9]), ('t5',)) is picire.Outcome.UNKNOWN
+
+    dd_obj = picire.ParallelDD(test, split=picire.splitter.ZellerSplit(n=2), cache=picire.cache.ConfigTupleCache(), proc_num=4)
+    assert [content[x] for x in dd_obj(list(range(len(config_a))))] == expect_a
+    test.close()
+
+    # All the servers are stopped.
+    with open(starts) as f:
+        for pid in f.read().split():
+            with pytest.raises(ProcessLookupError):
+                os.kill(int(pid), 0)
+
+
+def test_scheduler_priority():
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def blocker():
+        started.set()
+        release.wait()
+        return picire.Outcome.PASS
+
+    def record(name):
+        order.append(name)
+        return picire.Outcome.PASS
+
+    scheduler = picire.scheduler.Scheduler(1, policy=picire.scheduler.SmallestFirstPolicy())
+    scheduler.submit(blocker, config=picire.IntervalConfig(range(10)), kind='s', length=10)
+    started.wait()
+    futures = [scheduler.submit(record, name, config=picire.IntervalConfig(range(size)), kind='c', length=10) for name, size in [('c', 5), ('a', 1), ('b', 3)]]
+    cancelled = scheduler.submit(record, 'x', config=picire.IntervalConfig(range(2)), kind='c', length=10)
+    assert cancelled.cancel()
+    release.set()
+    assert [future.result() for future in futures] == [picire.Outcome.PASS] * 3
+    assert order == ['a', 'b', 'c']
+    scheduler.shutdown()
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_scheduler_finish(executor):
+    finished = []
+
+    def finish(outcome):
+        # Runs before anyone waiting for the test is woken up.
+        finished.append(outcome)
+        return picire.Outcome.FAIL
+
+    scheduler = picire.scheduler.Scheduler(2, executor=executor)
+    future = scheduler.submit(picire.Outcome, 'PASS', config=picire.IntervalConfig(range(2)), kind='s', length=2, finish=finish)
+    concurrent.futures.wait([future])
+    assert finished == [picire.Outcome.PASS]
+    assert future.result() is picire.Outcome.FAIL
+    scheduler.shutdown()
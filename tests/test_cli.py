@@ -6,6 +6,7 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
+import json
 import os
 import platform
 import pytest
@@ -55,6 +56,11 @@ class TestCli:
         ('--split=zeller', '--complement-first', '--subset-iterator=backward', '--complement-iterator=backward', '--cache=config-tuple', '--cache-fail', '--no-cache-evict-after-fail'),
         ('--split=balanced', '--subset-iterator=skip', '--complement-iterator=forward', '--cache=content', '--cache-fail', '--no-cache-evict-after-fail'),
         ('--split=zeller', '--subset-iterator=skip', '--complement-iterator=backward', '--cache=content-hash', '--cache-fail', '--no-cache-evict-after-fail'),
+        ('--split=balanced', '--subset-iterator=forward', '--complement-iterator=backward', '--cache=bitset'),
+        ('--split=zeller', '--subset-iterator=forward', '--complement-iterator=forward', '--cache=config', '--reuse-test-dirs'),
+        ('--split=balanced', '--subset-iterator=forward', '--complement-iterator=backward', '--cache=config-tuple', '--timeout=60', '--timeout-outcome=pass'),
+        pytest.param(('--split=balanced', '--subset-iterator=backward', '--complement-iterator=forward', '--cache=content', '--delivery=stdin'),
+                     marks=pytest.mark.skipif(sys.platform.startswith('win'), reason='requires /dev/stdin')),
     ])
     def test_dd(self, test, inp, exp, tmpdir, args_atom, args):
         self._run_picire(test, inp, exp, tmpdir, args_atom + args)
@@ -66,6 +72,66 @@ class TestCli:
         ('--split=balanced', '--subset-iterator=backward', '--complement-iterator=backward', '--cache=config', '--cache-fail', '--no-cache-evict-after-fail'),
         ('--split=zeller', '--subset-iterator=skip', '--complement-iterator=forward', '--cache=content', '--cache-fail', '--no-cache-evict-after-fail'),
         ('--split=balanced', '--subset-iterator=skip', '--complement-iterator=backward', '--cache=content-hash', '--cache-fail', '--no-cache-evict-after-fail'),
+        ('--split=zeller', '--subset-iterator=forward', '--complement-iterator=backward', '--cache=content', '--parallel-executor=process'),
+        ('--split=balanced', '--subset-iterator=forward', '--complement-iterator=forward', '--cache=config', '--parallel-policy=smallest', '--speculate'),
+        ('--split=zeller', '--complement-first', '--subset-iterator=forward', '--complement-iterator=backward', '--cache=config-tuple', '--deterministic'),
+        ('--split=balanced', '--subset-iterator=backward', '--complement-iterator=forward', '--cache=config', '--adaptive-jobs', '--jobs-memory-reserve=1M'),
+        ('--split=zeller', '--subset-iterator=skip', '--complement-iterator=forward', '--cache=content-hash', '--parallel-executor=async', '--timeout=60'),
+        ('--split=balanced', '--subset-iterator=forward', '--complement-iterator=backward', '--cache=config-tuple', '--reuse-test-dirs', '--no-cleanup'),
+        pytest.param(('--split=zeller', '--subset-iterator=forward', '--complement-iterator=forward', '--cache=config', '--delivery=memfd'),
+                     marks=pytest.mark.skipif(not hasattr(os, 'memfd_create'), reason='requires memfd_create')),
     ])
     def test_parallel(self, test, inp, exp, tmpdir, args_atom, args):
         self._run_picire(test, inp, exp, tmpdir, args_atom + ('--parallel',) + args)
+
+
+_test_server = """
+import os, struct, subprocess, sys, tempfile
+while True:
+    header = sys.stdin.buffer.read(4)
+    if len(header) < 4:
+        break
+    content = sys.stdin.buffer.read(struct.unpack('>I', header)[0])
+    with tempfile.NamedTemporaryFile(suffix='.py', delete=False) as f:
+        f.write(content)
+    try:
+        proc = subprocess.run([sys.executable, f.name], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    finally:
+        os.remove(f.name)
+    response = b'FAIL' if b'sum: 55' in proc.stdout else b'PASS'
+    sys.stdout.buffer.write(struct.pack('>I', len(response)) + response)
+    sys.stdout.buffer.flush()
+"""
+
+
+@pytest.mark.skipif(is_windows, reason='requires POSIX pipes')
+def test_server_persistent_cache(tmpdir):
+    server = str(tmpdir.join('test-server.py'))
+    with open(server, 'w') as f:
+        f.write(f'#! {sys.executable}\n' + _test_server)
+    os.chmod(server, 0o755)
+
+    # The second run reduces from the cache of the first one.
+    for run in range(2):
+        out_dir = str(tmpdir.join(f'out{run}'))
+        cmd = (sys.executable, '-m', 'picire') \
+              + (f'--test={server}', '--input=inp-sumprod10.py', f'--out={out_dir}') \
+              + ('--log-level=TRACE', '--atom=line', '--test-server', '--cache=persistent', f'--cache-path={tmpdir.join("cache.db")}',
+                 f'--statistics={tmpdir.join("stats.json")}')
+        subprocess.run(cmd, cwd=resources_dir, check=True)
+
+        with open(os.path.join(out_dir, 'inp-sumprod10.py'), 'rb') as outf:
+            outb = outf.read()
+        with open(os.path.join(resources_dir, 'exp-sumprod10-sum.py'), 'rb') as expf:
+            expb = expf.read()
+        assert outb == expb
+
+        with open(str(tmpdir.join('stats.json'))) as f:
+            stats = json.load(f)
+        if run == 0:
+            assert stats['tests_passed'] > 0
+        else:
+            # All passing configurations come from the cache. (Failing ones
+            # are never stored in the persistent cache.)
+            assert stats['cache_hits'] > 0
+            assert stats['tests_passed'] == 0